@@ -0,0 +1,766 @@
+"""
+Offline benchmark for dashboard.py.
+
+Replays recorded upstream responses from local fixtures — HTTP through a
+stand-in requests transport, Yahoo through patched yf.download / yf.Ticker —
+and times every fetcher, the spread/curve analytics and full page runs
+through Streamlit's AppTest. Reports p50/p95 and peak memory per case, and
+fails when a case regresses past the stored baseline.
+
+Run:
+    python benchmark.py                    # replay fixtures, compare with baseline
+    python benchmark.py --record           # refresh fixtures from the live APIs
+    python benchmark.py --synthesize       # write synthetic fixtures (no network)
+    python benchmark.py --update-baseline  # accept the current numbers
+    python benchmark.py --only startup     # cold-start budget only
+
+The universe.* cases time the Yahoo snapshot over synthetic universes ten
+times apart, with Yahoo modelled as a fixed latency per symbol request —
+what the chunk planner buys. The startup.* cases spawn a fresh interpreter per sample: startup.import is
+Streamlit plus the dashboard's imports, startup.first_paint is the same up to
+the top bar being sent. Both also fail when they exceed STARTUP_BUDGET_MS,
+baseline or not.
+
+Fixtures and the baseline live under .bench/ (machine-specific, not committed).
+A run fails without fixtures (--record or --synthesize first) and without a
+baseline (--update-baseline first); results from synthetic fixtures say so.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent
+BENCH_DIR = ROOT / ".bench"
+SCRIPT = ROOT / "dashboard.py"
+
+# Query params that only move the fetch window; replay ignores them
+WINDOW_PARAMS = {"startPeriod", "cosd", "api_key"}
+YF_PERIOD_ROWS = {"1d": 1, "2d": 2, "5d": 5}
+
+REGRESSION_TOLERANCE = 0.25   # allowed relative slowdown over the baseline
+MIN_DELTA_MS = 2.0            # ...and absolute, so sub-ms noise never fails
+MIN_DELTA_MB = 1.0
+
+# universe.* cases: Yahoo modelled as a fixed latency per symbol request, universes 10x apart
+YF_STAND_IN_LATENCY = 0.05
+UNIVERSE_SIZES = (40, 400)
+
+# Cold-start budget per worker (ms), checked on every run
+STARTUP_BUDGET_MS = {"startup.import": 1500, "startup.first_paint": 2000}
+
+
+# ─────────────────────────────────────────────────────────────
+# FIXTURES
+# ─────────────────────────────────────────────────────────────
+
+def fixture_key(url: str) -> str:
+    """Stable id of a request: host, path and query without window params."""
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in WINDOW_PARAMS)
+    return f"{parts.netloc}{parts.path}?{urlencode(query)}"
+
+
+class Fixtures:
+    """
+    On-disk fixture set: http/<sha1>.json per request, yf/<ticker>.pkl with
+    each Yahoo ticker's daily OHLCV bars.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        (self.path / "http").mkdir(parents=True, exist_ok=True)
+        (self.path / "yf").mkdir(parents=True, exist_ok=True)
+
+    def exists(self) -> bool:
+        return any((self.path / "http").iterdir()) or any((self.path / "yf").iterdir())
+
+    @property
+    def synthetic(self) -> bool:
+        return (self.path / "SYNTHETIC").exists()
+
+    def mark_synthetic(self, synthetic: bool):
+        marker = self.path / "SYNTHETIC"
+        marker.touch() if synthetic else marker.unlink(missing_ok=True)
+
+    def _http_path(self, url: str) -> Path:
+        return self.path / "http" / f"{hashlib.sha1(fixture_key(url).encode()).hexdigest()}.json"
+
+    def save_http(self, url: str, status: int, body: str, content_type: str = "application/json"):
+        self._http_path(url).write_text(json.dumps(
+            {"key": fixture_key(url), "status": status, "content_type": content_type, "body": body}))
+
+    def load_http(self, url: str) -> dict | None:
+        path = self._http_path(url)
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def _bars_path(self, ticker: str) -> Path:
+        return self.path / "yf" / f"{ticker.replace('/', '_')}.pkl"
+
+    def save_bars(self, ticker: str, df: pd.DataFrame):
+        known = self.load_bars(ticker)
+        if known is not None:
+            df = df.combine_first(known)
+        df.sort_index().to_pickle(self._bars_path(ticker))
+
+    def load_bars(self, ticker: str) -> pd.DataFrame | None:
+        path = self._bars_path(ticker)
+        return pd.read_pickle(path) if path.exists() else None
+
+
+def _window(df: pd.DataFrame, period: str = None, start: str = None) -> pd.DataFrame:
+    """Rows of a daily frame inside a yfinance-style period / start window."""
+    if start is not None:
+        return df[df.index >= pd.Timestamp(start)]
+    if period in YF_PERIOD_ROWS:
+        return df.tail(YF_PERIOD_ROWS[period])
+    if period and period[:-1].isdigit() and period[-1] in "y":
+        return df[df.index >= df.index[-1] - pd.DateOffset(years=int(period[:-1]))]
+    if period and period[:-2].isdigit() and period.endswith("mo"):
+        return df[df.index >= df.index[-1] - pd.DateOffset(months=int(period[:-2]))]
+    return df
+
+
+def _intraday(daily: pd.DataFrame, ticker: str, interval: str, start) -> pd.DataFrame:
+    """
+    Intraday bars around the last daily close, from start (UTC) to now. Prices
+    are a fixed function of (ticker, bar time), so overlapping windows agree.
+    """
+    step = pd.Timedelta(interval.replace("m", "min"))
+    now = pd.Timestamp.now(tz="UTC").floor(step)
+    start = pd.Timestamp(start) if start is not None else now - pd.Timedelta(days=5)
+    index = pd.date_range(start.tz_convert("UTC").ceil(step), now, freq=step)
+    seed = int(hashlib.sha1(ticker.encode()).hexdigest()[:6], 16)
+    minutes = index.as_unit("s").asi8 // 60
+    close = float(daily["Close"].iloc[-1]) * (1 + 0.004 * np.sin(minutes / 97 + seed)
+                                              + 0.002 * np.sin(minutes / 13 + seed / 7))
+    return pd.DataFrame({"Open": close * 0.9995, "High": close * 1.001, "Low": close * 0.999,
+                         "Close": close, "Volume": float(seed % 1000 + 100)},
+                        index=pd.DatetimeIndex(index, name="Datetime"))
+
+
+def _download_frame(frames: dict, tickers: list, group_by: str) -> pd.DataFrame:
+    """Assemble per-ticker frames in the column layout yf.download returns."""
+    frames = {t: f for t, f in frames.items() if not f.empty}
+    if not frames:
+        return pd.DataFrame()
+    raw = pd.concat(frames, axis=1)                 # (ticker, field)
+    if group_by != "ticker":
+        raw = raw.swaplevel(axis=1).sort_index(axis=1)   # (field, ticker)
+    return raw
+
+
+def _split_download(raw: pd.DataFrame, tickers: list, group_by: str) -> dict:
+    """Inverse of _download_frame for a live yf.download result."""
+    if raw is None or raw.empty:
+        return {}
+    if not isinstance(raw.columns, pd.MultiIndex):
+        return {tickers[0]: raw}
+    level = 0 if group_by == "ticker" else 1
+    return {t: raw.xs(t, axis=1, level=level).dropna(how="all")
+            for t in tickers if t in raw.columns.get_level_values(level)}
+
+
+class _FastInfo:
+    """Stand-in for yf.Ticker.fast_info (the dashboard never reads it)."""
+
+    def __getattr__(self, name):
+        return None
+
+
+def install_replay(fixtures: Fixtures):
+    """Route every requests transport and Yahoo call to the fixtures (local stand-ins excepted)."""
+    import requests
+    import yfinance as yf
+    from requests.structures import CaseInsensitiveDict
+    live_send = requests.adapters.HTTPAdapter.send
+
+    def send(adapter, request, **kwargs):
+        if urlsplit(request.url).hostname == "127.0.0.1":
+            return live_send(adapter, request, **kwargs)
+        hit = fixtures.load_http(request.url)
+        resp = requests.Response()
+        resp.status_code = hit["status"] if hit else 404
+        resp.reason = "OK" if resp.status_code == 200 else "Not Found"
+        resp._content = (hit["body"] if hit else "").encode()
+        resp.headers = CaseInsensitiveDict(
+            {"Content-Type": hit["content_type"] if hit else "text/plain"})
+        resp.encoding = "utf-8"
+        resp.url, resp.request = request.url, request
+        return resp
+
+    def download(tickers, period=None, start=None, group_by="column", interval="1d", **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        frames = {}
+        for t in tickers:
+            bars = fixtures.load_bars(t)
+            if bars is not None and interval != "1d":
+                frames[t] = _intraday(bars, t, interval, start)
+            elif bars is not None:
+                frames[t] = _window(bars, period, start)
+        return _download_frame(frames, tickers, group_by)
+
+    class Ticker:
+        def __init__(self, symbol):
+            self.symbol, self.fast_info = symbol, _FastInfo()
+
+        def history(self, period="1mo", start=None, **kwargs):
+            bars = fixtures.load_bars(self.symbol)
+            return pd.DataFrame() if bars is None else _window(bars, period, start)
+
+    requests.adapters.HTTPAdapter.send = send
+    yf.download, yf.Ticker = download, Ticker
+
+
+def install_recorder(fixtures: Fixtures):
+    """Pass every call through to the live APIs and save what comes back."""
+    import requests
+    import yfinance as yf
+
+    live_send, live_download, live_ticker = requests.adapters.HTTPAdapter.send, yf.download, yf.Ticker
+
+    def send(adapter, request, **kwargs):
+        resp = live_send(adapter, request, **kwargs)
+        fixtures.save_http(request.url, resp.status_code, resp.text,
+                           resp.headers.get("Content-Type", "application/json"))
+        return resp
+
+    def download(tickers, group_by="column", **kwargs):
+        raw = live_download(tickers, group_by=group_by, **kwargs)
+        if kwargs.get("interval", "1d") != "1d":
+            return raw   # intraday replay is synthesized from the daily bars
+        names = [tickers] if isinstance(tickers, str) else list(tickers)
+        for t, df in _split_download(raw, names, group_by).items():
+            fixtures.save_bars(t, df)
+        return raw
+
+    class Ticker(live_ticker):
+        def history(self, *args, **kwargs):
+            df = super().history(*args, **kwargs)
+            if not df.empty:
+                fixtures.save_bars(self.ticker, df.tz_localize(None) if df.index.tz else df)
+            return df
+
+    requests.adapters.HTTPAdapter.send = send
+    yf.download, yf.Ticker = download, Ticker
+
+
+def record(fixtures: Fixtures, core):
+    """Run every fetcher once against the live APIs, saving the responses."""
+    install_recorder(fixtures)
+    fixtures.mark_synthetic(False)
+    core.fetch_yf_universe(core.SNAPSHOT_SYMBOLS)
+    core.fetch_yf_histories(core.HISTORY_TICKERS)
+    core.fetch_ecb_yields()
+    core.fetch_ecb_yields()   # the incremental query only covers series upstream had
+    core.fetch_fred_yields(os.environ.get("FRED_API_KEY", ""))
+    core.fetch_coingecko()
+    core.fetch_etf_flows(core.BTC_ETFS)
+
+
+def synthesize(fixtures: Fixtures, core, years: int = 2, seed: int = 7):
+    """
+    Deterministic random-walk fixtures in each upstream's wire format, for
+    machines that can't reach the APIs. Shapes match what --record writes.
+    """
+    fixtures.mark_synthetic(True)
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=261 * years)
+
+    def walk(start, vol):
+        return start + np.cumsum(rng.normal(0, vol, len(dates)))
+
+    for ticker in dict.fromkeys(core.SNAPSHOT_SYMBOLS + core.HISTORY_TICKERS + tuple(core.BTC_ETFS.values())):
+        close = np.abs(walk(100.0, 1.0)) + 1.0
+        opened = close * (1 + rng.normal(0, 0.002, len(dates)))
+        wick = np.abs(rng.normal(0, 0.005, (2, len(dates))))
+        fixtures.save_bars(ticker, pd.DataFrame({
+            "Open": opened, "Close": close,
+            "High": np.maximum(opened, close) * (1 + wick[0]), "Low": np.minimum(opened, close) * (1 - wick[1]),
+            "Volume": rng.integers(1_000_000, 50_000_000, len(dates)).astype(float),
+        }, index=pd.DatetimeIndex(dates, name="Date")))
+
+    # ECB SDMX-JSON: one combined dataset over every country × tenor
+    countries, tenors = list(core.ECB_COUNTRIES), list(core.ECB_TENORS)
+    dims = [{"id": "FREQ", "values": [{"id": "B"}]},
+            {"id": "REF_AREA", "values": [{"id": "U2"}]},
+            {"id": "CURRENCY", "values": [{"id": "EUR"}]},
+            {"id": "PROVIDER_FM", "values": [{"id": "4F"}]},
+            {"id": "INSTRUMENT_FM", "values": [{"id": f"G_N_{c}"} for c in countries]},
+            {"id": "PROVIDER_FM_ID", "values": [{"id": "SV_C_YM"}]},
+            {"id": "DATA_TYPE_FM", "values": [{"id": f"SR_{core.ECB_TENORS[t]}Y"} for t in tenors]}]
+    series = {}
+    for ci in range(len(countries)):
+        for ti, t in enumerate(tenors):
+            level = walk(2.0 + 0.4 * ci + 0.3 * ti, 0.03)
+            series[f"0:0:0:0:{ci}:0:{ti}"] = {
+                "observations": {str(k): [round(float(v), 4)] for k, v in enumerate(level)}}
+    payload = {"structure": {"dimensions": {
+                   "series": dims,
+                   "observation": [{"id": "TIME_PERIOD",
+                                    "values": [{"id": x.strftime("%Y-%m-%d")} for x in dates]}]}},
+               "dataSets": [{"series": series}]}
+    ecb_url = f"{core.ECB_BASE_URL}/{core._ecb_key(countries, tenors)}?format=jsondata"
+    fixtures.save_http(ecb_url, 200, json.dumps(payload))
+
+    base = "https://fred.stlouisfed.org/graph/fredgraph.json"
+    for i, series_id in enumerate(core.FRED_SERIES.values()):
+        level = walk(3.5 + 0.25 * i, 0.03)
+        fixtures.save_http(f"{base}?id={series_id}", 200, json.dumps({
+            "dates": [x.strftime("%Y-%m-%d") for x in dates],
+            "values": [f"{v:.2f}" for v in level]}))
+
+    import requests
+    coins = [cg_id for cg_id, _ in core.COINGECKO_IDS.values()]
+    prices = {"bitcoin": 65000.0, "ethereum": 3200.0, "solana": 150.0}
+    cg_url = requests.Request("GET", "https://api.coingecko.com/api/v3/simple/price", params={
+        "ids": ",".join(coins), "vs_currencies": "usd",
+        "include_24hr_change": "true", "include_market_cap": "true"}).prepare().url
+    fixtures.save_http(cg_url, 200, json.dumps({
+        coin: {"usd": px, "usd_24h_change": float(rng.normal(0, 2)), "usd_market_cap": px * 1e7}
+        for coin, px in ((c, prices.get(c, 100.0)) for c in coins)}))
+
+
+# ─────────────────────────────────────────────────────────────
+# STREAM STAND-IN
+# ─────────────────────────────────────────────────────────────
+
+class StreamStandIn:
+    """
+    Local push feed for the quote stream: ticks handed to push() go out as
+    server-sent JSON events (sse_url) and as Yahoo-format base64 protobuf
+    frames over a WebSocket (ws_url, when websockets is installed).
+    """
+
+    def __init__(self):
+        self._queues, self._lock = [], threading.Lock()
+        self.ws_url = None
+        stand_in = self
+
+        class SSE(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for tick in stand_in._listen(queue.Queue()):
+                    self.wfile.write(f"data: {json.dumps(tick)}\n\n".encode())
+                    self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), SSE)
+        self._http.daemon_threads = True
+        threading.Thread(target=self._http.serve_forever, daemon=True).start()
+        self.sse_url = f"http://127.0.0.1:{self._http.server_port}/stream"
+        try:
+            from websockets.sync.server import serve
+        except ImportError:
+            return
+        self._ws = serve(self._serve_ws, "127.0.0.1", 0)
+        threading.Thread(target=self._ws.serve_forever, daemon=True).start()
+        self.ws_url = f"ws://127.0.0.1:{self._ws.socket.getsockname()[1]}"
+
+    def _listen(self, q):
+        with self._lock:
+            self._queues.append(q)
+        while (tick := q.get()) is not None:
+            yield tick
+
+    def _serve_ws(self, conn):
+        from yfinance.pricing_pb2 import PricingData
+        conn.recv()                                   # the {"subscribe": [...]} message
+        for tick in self._listen(queue.Queue()):
+            data = PricingData(id=tick["symbol"], price=tick["price"], time=tick["time"],
+                               last_size=tick["size"])
+            conn.send(json.dumps({"type": "pricing",
+                                  "message": base64.b64encode(data.SerializeToString()).decode()}))
+
+    def push(self, symbol: str, price: float, size: int = 1):
+        tick = {"symbol": symbol, "price": price, "time": int(time.time() * 1000), "size": size}
+        with self._lock:
+            for q in self._queues:
+                q.put(tick)
+
+    def close(self):
+        with self._lock:
+            for q in self._queues:
+                q.put(None)
+        self._http.shutdown()
+        if self.ws_url:
+            self._ws.shutdown()
+
+
+# ─────────────────────────────────────────────────────────────
+# MEASUREMENT
+# ─────────────────────────────────────────────────────────────
+
+def measure(fn, repeat: int, setup=None) -> dict:
+    """p50/p95 wall time (ms) over repeat calls, then one traced call for peak memory (MB)."""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"p50": float(np.percentile(times, 50)), "p95": float(np.percentile(times, 95)),
+            "peak_mb": peak / 2**20, "n": repeat}
+
+
+def fetcher_cases(d) -> dict:
+    """Each fetcher with its cache cleared, against a warm local store (the steady state)."""
+    return {
+        "fetch.yf_snapshot": (d.REFRESH_JOBS["yahoo"], d.fetch_yf_universe.clear),
+        "fetch.yf_histories": (lambda: d.fetch_yf_histories(d.HISTORY_TICKERS), d.fetch_yf_histories.clear),
+        "fetch.yf_intraday": (lambda: d.fetch_yf_intraday(d.INTRADAY_SYMBOLS, "1m"), d.fetch_yf_intraday.clear),
+        "fetch.ecb_yields": (d.fetch_ecb_yields, d.fetch_ecb_yields.clear),
+        "fetch.fred_yields": (d.fetch_fred_yields, d.fetch_fred_yields.clear),
+        "fetch.coingecko": (d.fetch_coingecko, d.fetch_coingecko.clear),
+        "fetch.etf_flows": (lambda: d.fetch_etf_flows(d.BTC_ETFS), d.fetch_etf_flows.clear),
+    }
+
+
+def analytics_cases(d, core) -> dict:
+    store = core.timeseries_store()
+    cube = core.build_yield_cube(store)
+    fit = core.fit_cube(cube)
+    latest = {**d.fetch_ecb_yields(), "US": d.fetch_fred_yields()}
+    history = d.fetch_yf_histories(d.HISTORY_TICKERS)
+    long_series = pd.Series(np.cumsum(np.random.default_rng(0).normal(size=500_000)),
+                            index=pd.date_range("2000-01-01", periods=500_000, freq="min"))
+
+    def spreads_today():
+        for c1 in latest:
+            for c2 in latest:
+                for _, t1, t2 in core.SPREADS_DEF:
+                    core.compute_box(latest, c1, c2, t1, t2)
+
+    def cube_history():
+        for c1 in core.CUBE_COUNTRIES:
+            for c2 in core.CUBE_COUNTRIES:
+                for _, t1, t2 in core.SPREADS_DEF:
+                    cube.box(c1, c2, t1, t2)
+
+    # Rolling cross-asset window: one bar revision plus the full correlation matrix, as on each tick
+    closes = core.align_closes(d.fetch_yf_histories(tuple(core.CROSS_ASSETS.values())), core.CROSS_ASSETS)
+    wide = pd.DataFrame(100 * np.exp(np.cumsum(np.random.default_rng(1).normal(0, 0.01, (300, 500)), axis=0)),
+                        index=pd.bdate_range(end=pd.Timestamp.today(), periods=300))
+    engines = {}
+    for name, frame in (("cross_asset", closes), ("wide_500", wide)):
+        engines[name] = (core.RollingCrossAsset(), frame.index[-1], frame.to_numpy()[-1])
+        engines[name][0].seed(frame)
+
+    def rolling_tick(name):
+        engine, when, prices = engines[name]
+        engine.update(when, prices)
+        return engine.corr()
+
+    shared = core.SQLiteCache(core.STORE_PATH.parent / "cache.sqlite")
+    shared.set("history", history, time.time() + 3600)
+
+    return {
+        "cache.shared_hit": (lambda: shared.fetch_through("history", 0, dict), None),
+        "analytics.spreads_today": (spreads_today, None),
+        "analytics.yield_cube": (lambda: core.build_yield_cube(store), None),
+        "analytics.rolling_tick": (lambda: rolling_tick("cross_asset"), None),
+        "analytics.rolling_tick_500": (lambda: rolling_tick("wide_500"), None),
+        "analytics.rolling_seed": (lambda: core.RollingCrossAsset().seed(closes), None),
+        "analytics.cube_box_history": (cube_history, None),
+        "analytics.ns_fit_cold": (lambda: core.fit_cube(cube), None),
+        "analytics.ns_fit_warm": (lambda: core.fit_cube(cube, fit), None),
+        "analytics.downsample_500k": (lambda: d.downsample(long_series, d.point_budget()), None),
+        "render.price_chart": (lambda: d.price_chart(history["FGBL=F"], "RX", "RX", "#f7941d"), None),
+        "core.snapshot": (core.build_snapshot, None),
+    }
+
+
+def latency_download(bars: pd.DataFrame):
+    """
+    yf.download stand-in for any ticker: every one gets the same bars, after
+    YF_STAND_IN_LATENCY per round of requests its threads allow (yfinance
+    sends one request per symbol).
+    """
+    def download(tickers, period=None, group_by="column", threads=True, **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        width = len(tickers) if threads is True else max(int(threads), 1)
+        time.sleep(YF_STAND_IN_LATENCY * -(-len(tickers) // width))
+        window = _window(bars, period)
+        return _download_frame({t: window for t in tickers}, tickers, group_by)
+
+    return download
+
+
+def universe_cases(core, fixtures: Fixtures) -> dict:
+    """The Yahoo snapshot over synthetic universes UNIVERSE_SIZES apart: chunk planning under latency."""
+    import yfinance as yf
+    stand_in = latency_download(fixtures.load_bars(core.SNAPSHOT_SYMBOLS[0]))
+
+    def snapshot(n):
+        symbols = tuple(f"U{i:04d}" for i in range(n))
+
+        def run():
+            replay, yf.download = yf.download, stand_in
+            try:
+                core.fetch_yf_universe(symbols)
+            finally:
+                yf.download = replay
+        return run
+
+    return {f"universe.snapshot_{n}": (snapshot(n), None) for n in UNIVERSE_SIZES}
+
+
+def stream_cases(core, stand_in: StreamStandIn) -> dict:
+    """Tick ring ingest, bars and tile quotes over a full ring; push-to-ring latency per transport."""
+    n = core.RING_SIZE
+    t = time.time() - np.arange(n)[::-1] * 0.25
+    prices = 60_000 + np.cumsum(np.random.default_rng(0).normal(size=n))
+    full = core.TickRing()
+    for ti, p in zip(t, prices):
+        full.append(ti, p, 1)
+
+    def ingest():
+        ring = core.TickRing()
+        for ti, p in zip(t, prices):
+            ring.append(ti, p, 1)
+
+    cases = {
+        "stream.ring_ingest": (ingest, None),
+        "stream.ohlc_1m": (lambda: full.ohlc(60), None),
+        "stream.tile_quote": (lambda: core.stream_quote({"price": 60_000, "chg": 100, "pct": 0.17}, full), None),
+    }
+    for transport, url in (("sse", stand_in.sse_url), ("ws", stand_in.ws_url)):
+        if url:
+            cases[f"stream.push_to_ring_{transport}"] = (push_to_ring(core, stand_in, url), None)
+    return cases
+
+
+def push_to_ring(core, stand_in: StreamStandIn, url: str, timeout: float = 10):
+    """A connected QuoteStream on url, and a call that pushes one tick and waits until it is buffered."""
+    stream = core.QuoteStream(url, ["BTC-USD"])
+
+    def one_tick():
+        seen, deadline = stream.ticks, time.time() + timeout
+        stand_in.push("BTC-USD", 60_000.0)
+        while stream.ticks == seen:
+            if time.time() > deadline:
+                raise RuntimeError(f"no tick from {url}: {stream.status()}")
+            time.sleep(0.0002)
+
+    # Ticks pushed before the subscription lands are dropped; retry until one arrives
+    deadline = time.time() + timeout
+    while not stream.ticks:
+        if time.time() > deadline:
+            raise RuntimeError(f"quote stream never connected to {url}: {stream.status()}")
+        stand_in.push("BTC-USD", 60_000.0)
+        time.sleep(0.05)
+    return one_tick
+
+
+def page_cases(repeat: int) -> dict:
+    """Full script runs of main() through AppTest: the first (cold) run, then warm reruns."""
+    from streamlit.testing.v1 import AppTest
+
+    def run():
+        at = AppTest.from_file(str(SCRIPT), default_timeout=120)
+        at.run()
+        if at.exception:
+            raise RuntimeError(f"dashboard raised: {at.exception[0].message}")
+
+    return {"page.cold": (run, None, 1), "page.warm": (run, None, max(repeat // 4, 3))}
+
+
+def probe_startup(kind: str, fixtures: Fixtures) -> dict:
+    """
+    One cold start, in this fresh interpreter. "import" loads the dashboard
+    bare (main() does not run); "paint" runs it through AppTest against the
+    fixtures and reads back the dashboard's own startup metrics.
+    """
+    t0 = time.perf_counter()
+    import streamlit  # noqa: F401 — the server has it loaded before the script runs
+    streamlit_ms = (time.perf_counter() - t0) * 1000
+    if kind == "import":
+        import streamlit.logger
+        streamlit.logger.set_log_level("error")
+        import dashboard
+        ms = streamlit_ms + dashboard._IMPORT_MS
+    else:
+        from streamlit.testing.v1 import AppTest
+        import macro_core as core
+        install_replay(fixtures)
+        AppTest.from_file(str(SCRIPT), default_timeout=120).run()
+        paints = [e["ms"] for e in core.metrics()._events if e["name"] == "first_paint"]
+        ms = streamlit_ms + paints[0]
+    return {"ms": ms, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def measure_startup(kind: str, repeat: int, fixtures: Fixtures) -> dict:
+    """p50/p95 of probe_startup over repeat fresh interpreters; peak is the largest RSS seen."""
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, str(Path(__file__).resolve()), "--probe", kind,
+                              "--fixtures", str(fixtures.path)],
+                             capture_output=True, text=True, check=True, cwd=ROOT)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    times = [s["ms"] for s in samples]
+    return {"p50": float(np.percentile(times, 50)), "p95": float(np.percentile(times, 95)),
+            "peak_mb": max(s["rss_mb"] for s in samples), "n": repeat}
+
+
+def startup_cases(repeat: int, fixtures: Fixtures) -> dict:
+    n = max(repeat // 4, 3)
+    return {
+        "startup.import": (lambda: measure_startup("import", n, fixtures)),
+        "startup.first_paint": (lambda: measure_startup("paint", n, fixtures)),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# BASELINE
+# ─────────────────────────────────────────────────────────────
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Names of the cases whose p95 or peak memory regressed past the baseline."""
+    failed = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        slow = r["p95"] > base["p95"] * (1 + tolerance) and r["p95"] - base["p95"] > MIN_DELTA_MS
+        heavy = (r["peak_mb"] > base["peak_mb"] * (1 + tolerance)
+                 and r["peak_mb"] - base["peak_mb"] > MIN_DELTA_MB)
+        if slow or heavy:
+            failed.append(name)
+    return failed
+
+
+def over_budget(results: dict) -> list:
+    """Names of the startup cases whose p95 is past STARTUP_BUDGET_MS."""
+    return [name for name, budget in STARTUP_BUDGET_MS.items()
+            if name in results and results[name]["p95"] > budget]
+
+
+def report(results: dict, baseline: dict, failed: list, over: list = ()):
+    print(f"{'case':<28}{'p50 ms':>10}{'p95 ms':>10}{'peak MB':>10}{'base p95':>10}")
+    for name, r in results.items():
+        base = baseline.get(name, {}).get("p95")
+        mark = "  REGRESSED" if name in failed else ""
+        if name in over:
+            mark += f"  OVER BUDGET ({STARTUP_BUDGET_MS[name]} ms)"
+        print(f"{name:<28}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['peak_mb']:>10.2f}"
+              f"{(f'{base:.2f}' if base is not None else '—'):>10}{mark}")
+
+
+# ─────────────────────────────────────────────────────────────
+# MAIN
+# ─────────────────────────────────────────────────────────────
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    ap.add_argument("--fixtures", type=Path, default=BENCH_DIR / "fixtures")
+    ap.add_argument("--baseline", type=Path, default=BENCH_DIR / "baseline.json")
+    ap.add_argument("--record", action="store_true", help="refresh fixtures from the live APIs and exit")
+    ap.add_argument("--synthesize", action="store_true", help="write synthetic fixtures and exit")
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    ap.add_argument("--only", default="", help="run only cases whose name starts with this")
+    ap.add_argument("--probe", choices=("import", "paint"), help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    # Every run gets its own store; the dashboard reads the path at import.
+    # Fetchers are timed against upstream (replayed), not the cross-replica cache
+    os.environ["MACRO_STORE_PATH"] = str(Path(tempfile.mkdtemp(prefix="macro-bench-")) / "ts.sqlite")
+    os.environ["MACRO_CACHE_URL"] = "none"
+    os.environ["MACRO_STREAM_URL"] = "none"   # stream.* cases run their own feed
+    sys.path.insert(0, str(ROOT))
+    if args.probe:
+        print(json.dumps(probe_startup(args.probe, Fixtures(args.fixtures))))
+        return 0
+    import dashboard as d
+    import macro_core as core
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")   # bare-mode warnings on every cached call
+
+    fixtures = Fixtures(args.fixtures)
+    if args.record:
+        record(fixtures, core)
+        print(f"fixtures recorded to {fixtures.path}")
+        return 0
+    if args.synthesize:
+        synthesize(fixtures, core)
+        print(f"synthetic fixtures written to {fixtures.path}")
+        return 0
+    if not fixtures.exists():
+        print(f"no fixtures in {fixtures.path}: run --record (live APIs) or --synthesize first")
+        return 2
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if not baseline and not args.update_baseline:
+        print(f"no baseline at {args.baseline}: run with --update-baseline to record one")
+        return 2
+    if fixtures.synthetic:
+        print(f"NOTE: replaying SYNTHETIC fixtures from {fixtures.path} — not recorded upstream data")
+    install_replay(fixtures)
+
+    # Warm the store once so the fetchers below measure the incremental path
+    for fn, _ in fetcher_cases(d).values():
+        fn()
+
+    cases = {name: (fn, setup, args.repeat) for name, (fn, setup) in fetcher_cases(d).items()}
+    cases.update({name: (fn, setup, args.repeat) for name, (fn, setup) in analytics_cases(d, core).items()})
+    stand_in = StreamStandIn()
+    cases.update({name: (fn, setup, args.repeat) for name, (fn, setup) in stream_cases(core, stand_in).items()})
+    cases.update({name: (fn, setup, max(args.repeat // 4, 3))
+                  for name, (fn, setup) in universe_cases(core, fixtures).items()})
+    cases.update(page_cases(args.repeat))
+    results = {}
+    for name, (fn, setup, repeat) in cases.items():
+        if name.startswith(args.only):
+            results[name] = measure(fn, repeat, setup)
+    stand_in.close()
+    for name, fn in startup_cases(args.repeat, fixtures).items():
+        if name.startswith(args.only):
+            results[name] = fn()
+
+    failed = [] if args.update_baseline else compare(results, baseline, args.tolerance)
+    over = over_budget(results)
+    report(results, baseline, failed, over)
+    if fixtures.synthetic:
+        print("NOTE: these numbers come from SYNTHETIC fixtures")
+    if args.update_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2))
+        print(f"baseline written to {args.baseline}")
+    if failed:
+        print(f"{len(failed)} case(s) regressed past the baseline (+{args.tolerance:.0%})")
+    if over:
+        print(f"{len(over)} startup case(s) over the cold-start budget")
+    return 1 if failed or over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,25 @@ Run:
     pip install streamlit yfinance plotly pandas requests fredapi
     streamlit run dashboard.py
 
+Headless (no Streamlit): data, storage and analytics live in macro_core.py
+    python macro_core.py snapshot -o snapshot.json
+
+Replicas: quote fetches are shared through MACRO_CACHE_URL — SQLite beside the
+local store by default (replicas on one host), redis://host:port/db across
+hosts, or "none" for per-process caching only. Fetchers that fill the local
+store run in every replica.
+
+Universe: every instrument, its group, row and display decimals come from
+universe.json (or the file in MACRO_UNIVERSE); a group the layout doesn't
+know gets its own card grid under WATCHLIST.
+
+Live tiles: crypto and FX tiles follow a push feed (MACRO_STREAM_URL) —
+Yahoo's streamer by default, any server-sent events feed of JSON ticks, or
+"none" to show the polled snapshot only.
+
+Shared state: what sessions read from the snapshot board and the parsed ASW
+upload are handed out uncopied — treat them as read-only.
+
 Data sources:
     - Yahoo Finance  → Equities, FX, Commodities, Crypto, Eurex futures
     - FRED API       → US yield curve (free key at fred.stlouisfed.org)
@@ -18,16 +37,64 @@ Data sources:
 ASW module: enter values manually or upload CSV exported from BBG/SEB.
 """
 
+from __future__ import annotations
+
+import sys
+import time
+
+# Streamlit re-executes this file on every run: the clock starts here each time,
+# and only the first run in a worker pays for the imports below
+_RUN_START = time.perf_counter()
+_COLD_START = "macro_core" not in sys.modules
+
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
-import requests
-from datetime import datetime, timedelta
-import time
+import numpy as np
+from datetime import datetime, timezone
+import contextvars
+import contextlib
+import functools
+import importlib
+import os
+import hashlib
 import json
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import macro_core as core
+from macro_core import (
+    UNIVERSE, group_instruments, group_rows, group_tickers,
+    EQUITIES, EUREX_FUTURES, FX, COMMODITIES, CRYPTO_YF, BTC_ETFS, ECB_COUNTRIES,
+    TENORS, SPREADS_DEF, SOVEREIGN_SPREADS, BOX_PAIRS,
+    METRICS_PORT, metrics, start_metrics_server, _call_stats, _row_count,
+    SingleFlight, call_key, shared_call, upstream_health,
+    http_pool_stats, STORE_PATH, timeseries_store,
+    SNAPSHOT_SYMBOLS, HISTORY_TICKERS, snapshot_slice, slice_period, fetch_stats,
+    YieldCube, build_yield_cube, CurveFit, fit_cube, fit_nelson_siegel, ns_yield,
+    compute_curve_spread, compute_box, compute_country_spread, crypto_quotes,
+    SOURCE_DEADLINES, SOURCE_DEFAULTS, run_sources,
+    STREAM_URL, STREAM_SYMBOLS, STREAM_BAR_SECONDS, QuoteStream, stream_quote,
+    intraday_snapshot, resample_bars,
+    CROSS_ASSETS, BETA_BENCHMARK, RollingCrossAsset, align_closes,
+)
+
+
+class _LazyModule:
+    """Module stand-in that imports the real one on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+
+# Charting loads with the first chart, after the top bar and tiles are on screen
+go = _LazyModule("plotly.graph_objects")
+
+_IMPORT_MS = (time.perf_counter() - _RUN_START) * 1000
 
 # ─────────────────────────────────────────────────────────────
 # CONFIG
@@ -182,253 +249,383 @@ hr { border-color: var(--border) !important; margin: 0.5rem 0 !important; }
 """, unsafe_allow_html=True)
 
 # ─────────────────────────────────────────────────────────────
-# CONSTANTS & TICKERS
+# CONSTANTS
 # ─────────────────────────────────────────────────────────────
 
-EQUITIES = {
-    # Europe
-    "EURO STOXX 50": "^STOXX50E",
-    "DAX":           "^GDAXI",
-    "CAC 40":        "^FCHI",
-    "FTSE 100":      "^FTSE",
-    "IBEX 35":       "^IBEX",
-    "FTSE MIB":      "FTSEMIB.MI",
-    # US
-    "S&P 500":       "^GSPC",
-    "NASDAQ 100":    "^NDX",
-    "DOW JONES":     "^DJI",
-    "RUSSELL 2000":  "^RUT",
-    # Asia
-    "NIKKEI 225":    "^N225",
-    "HANG SENG":     "^HSI",
-    "CSI 300":       "000300.SS",
-    "KOSPI":         "^KS11",
+# Universes, tenors and spread definitions live in macro_core
+COLORS = {
+    "bg": "#0a0a0f", "accent": "#f7941d", "accent2": "#00d4ff",
+    "green": "#00c27a", "red": "#ff3d5a", "text": "#d4d4e0",
+    "grid": "#1e1e2a", "dim": "#6b6b7f",
+    "DE": "#f7941d", "FR": "#00d4ff", "IT": "#a855f7",
+    "ES": "#fbbf24", "US": "#00c27a",
 }
 
-EUREX_FUTURES = {
-    "Bund (RX)":     "FGBL=F",   # 10Y
-    "Bobl (OE)":     "FGBM=F",   # 5Y
-    "Schatz (DU)":   "FGBS=F",   # 2Y
-    "Buxl (UB)":     "FGBX=F",   # 30Y
-}
+# ─────────────────────────────────────────────────────────────
+# INSTRUMENTATION
+# ─────────────────────────────────────────────────────────────
 
-FX = {
-    "EUR/USD": "EURUSD=X",
-    "USD/JPY": "USDJPY=X",
-    "GBP/USD": "GBPUSD=X",
-    "EUR/GBP": "EURGBP=X",
-    "EUR/CHF": "EURCHF=X",
-    "DXY":     "DX-Y.NYB",
-}
+STALE_TTLS = 10   # an expired entry is served while it revalidates for up to this many ttls
 
-COMMODITIES = {
-    "WTI Oil":    "CL=F",
-    "Brent Oil":  "BZ=F",
-    "Gold":       "GC=F",
-    "Silver":     "SI=F",
-    "Nat Gas":    "NG=F",
-    "Copper":     "HG=F",
-}
 
-CRYPTO_YF = {
-    "Bitcoin":  "BTC-USD",
-    "Ethereum": "ETH-USD",
-    "Solana":   "SOL-USD",
-}
+@st.cache_resource
+def revalidator() -> ThreadPoolExecutor:
+    """Background refreshes for stale-while-revalidate; one pool per server process."""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="revalidate")
 
-# Bitcoin Spot ETFs for flow proxy
-BTC_ETFS = {
-    "IBIT (BlackRock)": "IBIT",
-    "FBTC (Fidelity)":  "FBTC",
-    "BITB (Bitwise)":   "BITB",
-    "ARKB (ARK)":       "ARKB",
-}
 
-# FRED series for US yield curve
-FRED_SERIES = {
-    "2Y":  "DGS2",
-    "5Y":  "DGS5",
-    "10Y": "DGS10",
-    "30Y": "DGS30",
-}
+@st.cache_resource
+def flight_state(name: str) -> tuple[SingleFlight, dict]:
+    """A source's SingleFlight and last good results, one per server process (this module reruns)."""
+    return SingleFlight(), {}
 
-# ECB SDW series IDs for sovereign yields
-# Format: IRS.M.{country}.L.L45.YC.EUR.{tenor}.?YF.M.A
-ECB_COUNTRIES = {
-    "DE": "Germany",
-    "FR": "France",
-    "IT": "Italy",
-    "ES": "Spain",
-    "GB": "United Kingdom",
-}
-ECB_TENORS = {"2Y": "2", "5Y": "5", "10Y": "10", "30Y": "30"}
 
-COLORS = {
-    "bg": "#0a0a0f", "accent": "#f7941d", "accent2": "#00d4ff",
-    "green": "#00c27a", "red": "#ff3d5a", "text": "#d4d4e0",
-    "grid": "#1e1e2a", "dim": "#6b6b7f",
-    "DE": "#f7941d", "FR": "#00d4ff", "IT": "#a855f7",
-    "ES": "#fbbf24", "US": "#00c27a",
-}
+def instrumented(name: str, shared: bool = True, **cache_kwargs):
+    """
+    st.cache_data(**cache_kwargs) in front of the cross-replica shared cache
+    (shared_call), recording every call in metrics(): wall time, cache
+    hit/miss, the last HTTP status and bytes received by the body (via
+    http_get), the row count of the result and its age. Calls are keyed by
+    their ttl window so every replica expires an entry at the same moment.
+    shared=False skips the cross-replica cache, for fetchers that top up
+    process-local state and so must run in every replica.
+
+    Concurrent misses for the same arguments share one fetch (SingleFlight).
+    Once an entry's window has passed, callers get the last good value at
+    once while a single background call revalidates it; call.fresh(...)
+    always waits for current data, as the refresher does. Sessions read the
+    snapshot board, which already serves last-good data while the refresher
+    polls; the stale path is for direct callers like the per-session FRED key.
+    """
+    ttl = cache_kwargs["ttl"]
+
+    def decorate(fn):
+        # latest: call_key -> (window, fetched_at, value) of the last good result
+        flights, latest = flight_state(name)
+
+        def stamped(*args, **kwargs):
+            return time.time(), fn(*args, **kwargs)
+
+        @functools.wraps(fn)
+        def body(window, *args, **kwargs):
+            _call_stats.get()["hit"] = False   # only runs on a local cache miss
+            if not shared:
+                return stamped(*args, **kwargs)
+            return shared_call(name, ttl, window, stamped, args, kwargs)
+
+        cached = st.cache_data(**cache_kwargs)(body)
+
+        def load(key, args, kwargs) -> tuple:
+            window = int(time.time() // ttl)
+            fetched_at, value = flights.do(key, lambda: cached(window, *args, **kwargs))
+            if key not in latest or latest[key][1] <= fetched_at:
+                latest[key] = (window, fetched_at, value)
+            return fetched_at, value
+
+        def serve(args, kwargs, stale_ok: bool) -> tuple:
+            key = call_key(args, kwargs)
+            last, now = latest.get(key), time.time()
+            if (stale_ok and last is not None and last[0] != int(now // ttl)
+                    and now - last[1] < STALE_TTLS * ttl):
+                if not flights.busy(key):
+                    revalidator().submit(invoke, False, args, kwargs)
+                return last[1], last[2]
+            return load(key, args, kwargs)
+
+        def invoke(stale_ok: bool, args: tuple, kwargs: dict):
+            stats = {"hit": True, "status": None, "bytes": 0}
+            token = _call_stats.set(stats)
+            started, result, error, age = time.perf_counter(), None, None, None
+            try:
+                fetched_at, result = serve(args, kwargs, stale_ok)
+                age = time.time() - fetched_at
+                return result
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                _call_stats.reset(token)
+                metrics().record("fetch", name, (time.perf_counter() - started) * 1000,
+                                 stats["hit"], stats["status"], stats["bytes"],
+                                 _row_count(result), error, age)
+
+        @functools.wraps(fn)
+        def call(*args, **kwargs):
+            return invoke(True, args, kwargs)
+
+        def clear():
+            cached.clear()
+            latest.clear()
+
+        call.fresh = lambda *args, **kwargs: invoke(False, args, kwargs)
+        call.clear = clear
+        return call
+    return decorate
+
+
+@st.cache_resource
+def metrics_server(port: int):
+    """Started once per server process."""
+    return start_metrics_server(port)
+
 
 # ─────────────────────────────────────────────────────────────
-# DATA FETCHING HELPERS
+# DATA FETCHING
 # ─────────────────────────────────────────────────────────────
 
-@st.cache_data(ttl=60)
-def fetch_yf_snapshot(tickers: dict) -> dict:
-    """Fetch last price + day change for a dict of {label: ticker}."""
-    results = {}
-    symbols = list(tickers.values())
-    try:
-        raw = yf.download(symbols, period="2d", interval="1d",
-                          group_by="ticker", progress=False, threads=True)
-        for label, sym in tickers.items():
-            try:
-                if len(symbols) == 1:
-                    closes = raw["Close"]
-                else:
-                    closes = raw[sym]["Close"] if sym in raw.columns.get_level_values(0) else raw["Close"]
-                closes = closes.dropna()
-                if len(closes) >= 2:
-                    last = float(closes.iloc[-1])
-                    prev = float(closes.iloc[-2])
-                    chg = last - prev
-                    pct = (chg / prev) * 100
-                    results[label] = {"price": last, "chg": chg, "pct": pct, "ok": True}
-                elif len(closes) == 1:
-                    results[label] = {"price": float(closes.iloc[-1]), "chg": 0, "pct": 0, "ok": True}
-                else:
-                    results[label] = {"price": None, "chg": 0, "pct": 0, "ok": False}
-            except Exception:
-                results[label] = {"price": None, "chg": 0, "pct": 0, "ok": False}
-    except Exception as e:
-        for label in tickers:
-            results[label] = {"price": None, "chg": 0, "pct": 0, "ok": False}
-    return results
+# The macro_core fetchers behind the Streamlit cache, instrumented per source.
+# Fetchers that fill the replica's own store or in-memory state (history, yields,
+# intraday bars, the ETF flow book) run in every replica: a shared hit would skip it
+fetch_yf_universe = instrumented("yahoo", ttl=60)(core.fetch_yf_universe)
+fetch_yf_histories = instrumented("history", shared=False, ttl=60)(core.fetch_yf_histories)
+fetch_yf_intraday = instrumented("intraday", shared=False, ttl=60)(core.fetch_yf_intraday)
+fetch_fred_yields = instrumented("fred", shared=False, ttl=300)(core.fetch_fred_yields)
+fetch_ecb_yields = instrumented("ecb", shared=False, ttl=300)(core.fetch_ecb_yields)
+fetch_coingecko = instrumented("coingecko", ttl=120)(core.fetch_coingecko)
+fetch_etf_flows = instrumented("etf", shared=False, ttl=300)(core.fetch_etf_flows)
 
 
-@st.cache_data(ttl=60)
-def fetch_yf_history(ticker: str, period: str = "6mo") -> pd.DataFrame:
-    """Return OHLCV DataFrame."""
-    try:
-        df = yf.download(ticker, period=period, interval="1d", progress=False)
-        return df
-    except Exception:
-        return pd.DataFrame()
+# Intraday mode polls 1m bars of every tile and chart symbol; 5m charts are resampled from them
+INTRADAY_SYMBOLS = tuple(dict.fromkeys(SNAPSHOT_SYMBOLS + HISTORY_TICKERS))
+INTRADAY_BARS = ("5m", "1m")
+
+
+def fetch_intraday() -> dict:
+    """Intraday tiles (change vs prior close and session open) and chart bars, from one 1m poll."""
+    bars = fetch_yf_intraday.fresh(INTRADAY_SYMBOLS, "1m")
+    charts = {t: bars[t] for t in HISTORY_TICKERS if t in bars}
+    return {"snapshot": intraday_snapshot(bars, SNAPSHOT_SYMBOLS),
+            "bars": {"1m": charts, "5m": {t: resample_bars(df, "5min") for t, df in charts.items()}}}
+
+
+@st.cache_resource
+def cross_asset_engine() -> RollingCrossAsset:
+    """Rolling cross-asset window, one per server process; each refresh only applies new bars."""
+    return RollingCrossAsset()
+
+
+def fetch_cross_asset() -> dict:
+    """Rolling vol, beta and correlations of CROSS_ASSETS, moved forward by the latest closes."""
+    histories = fetch_yf_histories.fresh(tuple(CROSS_ASSETS.values()))
+    engine = cross_asset_engine()
+    engine.sync(align_closes(histories, CROSS_ASSETS))
+    return engine.stats()
+
+
+@st.cache_resource
+def quote_stream() -> QuoteStream | None:
+    """Live tick feed for the crypto and FX tiles, one per server process (None when disabled)."""
+    if STREAM_URL.lower() in ("", "none"):
+        return None
+    return QuoteStream(STREAM_URL, STREAM_SYMBOLS)
+
+
+# ─────────────────────────────────────────────────────────────
+# ASW CSV INGESTION
+# ─────────────────────────────────────────────────────────────
+
+ASW_CACHE_DIR = STORE_PATH.parent / "asw"
+ASW_CHUNK_ROWS = 250_000
+
+
+def file_digest(f, block: int = 1 << 20) -> str:
+    """SHA-256 of a file-like object, read in blocks."""
+    f.seek(0)
+    h = hashlib.sha256()
+    for chunk in iter(lambda: f.read(block), b""):
+        h.update(chunk)
+    f.seek(0)
+    return h.hexdigest()
+
 
+def _count_lines(f, block: int = 1 << 20) -> int:
+    f.seek(0)
+    n = sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(block), b""))
+    f.seek(0)
+    return n + 1
 
-@st.cache_data(ttl=300)
-def fetch_fred_yields(api_key: str = "") -> dict:
+
+def _parse_asw_csv(f) -> pd.DataFrame:
     """
-    Fetch US treasury yields from FRED.
-    If no API key, tries public JSON endpoint (observation limit applies).
-    Returns {tenor: latest_yield_pct}
+    Chunked parse into preallocated float32 columns, one chunk of ASW_CHUNK_ROWS as
+    text at a time. Values are coerced, so any Bloomberg "#N/A ..." token becomes NaN.
     """
-    yields = {}
-    base = "https://fred.stlouisfed.org/graph/fredgraph.json"
-    for tenor, series in FRED_SERIES.items():
+    f.seek(0)
+    header = pd.read_csv(f, index_col=0, nrows=0)
+    columns = header.columns
+    capacity = _count_lines(f)       # upper bound on data rows; trimmed below
+    index = np.empty(capacity, dtype="datetime64[ns]")
+    values = {c: np.empty(capacity, dtype="float32") for c in columns}
+    n = 0
+    for chunk in pd.read_csv(f, index_col=0, chunksize=ASW_CHUNK_ROWS, dtype=str, keep_default_na=False):
+        m = len(chunk)
+        index[n:n + m] = pd.to_datetime(chunk.index).as_unit("ns")
+        for c in columns:
+            values[c][n:n + m] = pd.to_numeric(chunk[c], errors="coerce").astype("float32")
+        n += m
+    f.seek(0)
+    return pd.DataFrame({c: v[:n] for c, v in values.items()},
+                        index=pd.DatetimeIndex(index[:n], name=header.index.name or "date"), copy=False)
+
+
+def _save_asw_columnar(df: pd.DataFrame, path: Path):
+    """Compact columnar copy: datetime64[ns] index + one float32 array per column."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez(tmp, __index__=df.index.to_numpy(dtype="datetime64[ns]"), __columns__=np.array(df.columns, dtype=str),
+             **{f"c{i}": df[c].to_numpy(dtype="float32") for i, c in enumerate(df.columns)})
+    tmp.replace(path)
+
+
+def _load_asw_columnar(path: Path) -> pd.DataFrame:
+    with np.load(path) as z:
+        columns = list(z["__columns__"])
+        return pd.DataFrame({c: z[f"c{i}"] for i, c in enumerate(columns)},
+                            index=pd.DatetimeIndex(z["__index__"], name="date"), copy=False)
+
+
+@st.cache_resource(max_entries=4)
+def load_asw_csv(digest: str, _uploaded) -> pd.DataFrame:
+    """Parsed ASW upload, keyed by content hash; the columnar copy on disk survives restarts."""
+    path = ASW_CACHE_DIR / f"{digest}.npz"
+    if path.exists():
         try:
-            url = f"{base}?id={series}"
-            if api_key:
-                url += f"&api_key={api_key}"
-            r = requests.get(url, timeout=8)
-            if r.status_code == 200:
-                data = r.json()
-                # fredgraph returns {dates: [...], values: [...]}
-                vals = data.get("values", [])
-                if vals:
-                    last = [v for v in vals if v != "."]
-                    if last:
-                        yields[tenor] = float(last[-1])
+            df = _load_asw_columnar(path)
+            df.attrs["digest"] = digest
+            return df
         except Exception:
-            pass
-    return yields
+            path.unlink(missing_ok=True)
+    df = _parse_asw_csv(_uploaded)
+    _save_asw_columnar(df, path)
+    df.attrs["digest"] = digest
+    return df
+
+
+def uploaded_asw(uploaded) -> pd.DataFrame:
+    """Frame for the current upload; the file is hashed once per upload, not per rerun."""
+    file_id = getattr(uploaded, "file_id", None) or (uploaded.name, uploaded.size)
+    cached = st.session_state.get("_asw_digest")
+    if cached is None or cached[0] != file_id:
+        cached = st.session_state["_asw_digest"] = (file_id, file_digest(uploaded))
+    return load_asw_csv(cached[1], uploaded)
 
 
-@st.cache_data(ttl=300)
-def fetch_ecb_yields() -> dict:
+# ─────────────────────────────────────────────────────────────
+# HISTORICAL SPREAD ENGINE
+# ─────────────────────────────────────────────────────────────
+
+@st.cache_resource(ttl=300, max_entries=2)
+def load_yield_cube(versions: tuple) -> YieldCube:
     """
-    Fetch EUR sovereign yields from ECB Statistical Data Warehouse.
-    Returns {country: {tenor: yield_pct}}
-    ECB SDW REST API — no key required.
+    Yield cube over everything in the local store.
+    versions: published versions of the yield sources — a new version builds a new cube.
     """
-    results = {c: {} for c in ECB_COUNTRIES}
-    # ECB SDW yield curve dataset: YC (yield curves)
-    # Series key: YC.B.U2.EUR.4F.G_N_{country}.SV_C_YM.SR_{tenor}Y
-    base = "https://data-api.ecb.europa.eu/service/data"
-    # Map country codes to ECB codes
-    ecb_codes = {"DE": "DE", "FR": "FR", "IT": "IT", "ES": "ES", "GB": "GB"}
-    for country, ecb_cc in ecb_codes.items():
-        for tenor_label, tenor_yr in ECB_TENORS.items():
-            try:
-                # ECB Yield Curves dataset
-                key = f"YC/B.U2.EUR.4F.G_N_{ecb_cc}.SV_C_YM.SR_{tenor_yr}Y"
-                url = f"{base}/{key}?lastNObservations=1&format=jsondata"
-                r = requests.get(url, timeout=8, headers={"Accept": "application/json"})
-                if r.status_code == 200:
-                    jd = r.json()
-                    obs = jd["dataSets"][0]["series"]
-                    # Get first series observations
-                    series_key = list(obs.keys())[0]
-                    observations = obs[series_key]["observations"]
-                    if observations:
-                        last_key = sorted(observations.keys(), key=int)[-1]
-                        val = observations[last_key][0]
-                        if val is not None:
-                            results[country][tenor_label] = float(val)
-            except Exception:
-                pass
-    return results
+    return build_yield_cube(timeseries_store())
 
 
-@st.cache_data(ttl=120)
-def fetch_coingecko() -> dict:
-    """Fetch BTC/ETH/SOL prices and 24h change from CoinGecko (free, no key)."""
-    try:
-        url = "https://api.coingecko.com/api/v3/simple/price"
-        params = {
-            "ids": "bitcoin,ethereum,solana",
-            "vs_currencies": "usd",
-            "include_24hr_change": "true",
-            "include_market_cap": "true",
-        }
-        r = requests.get(url, params=params, timeout=8)
-        if r.status_code == 200:
-            return r.json()
-    except Exception:
-        pass
+def source_versions(*sources: str) -> tuple:
+    """Published snapshot versions of the given sources (0 when not yet published)."""
+    board = refresher().board
+    return tuple((e["version"] if (e := board.get(n)) else 0) for n in sources)
+
+
+# ─────────────────────────────────────────────────────────────
+# CURVE FITTING (Nelson-Siegel)
+# ─────────────────────────────────────────────────────────────
+
+@st.cache_resource
+def _curve_fit_state() -> dict:
+    """Last batch fit, kept to warm-start the next one."""
     return {}
 
 
-@st.cache_data(ttl=300)
-def fetch_etf_volumes(tickers: dict) -> dict:
-    """Get volume + AUM proxy from Yahoo for BTC ETFs."""
-    results = {}
-    for name, sym in tickers.items():
-        try:
-            t = yf.Ticker(sym)
-            info = t.fast_info
-            hist = t.history(period="5d")
-            if not hist.empty:
-                last_vol = int(hist["Volume"].iloc[-1])
-                last_price = float(hist["Close"].iloc[-1])
-                prev_vol = int(hist["Volume"].iloc[-2]) if len(hist) > 1 else last_vol
-                results[name] = {
-                    "price": last_price,
-                    "volume": last_vol,
-                    "vol_chg": last_vol - prev_vol,
-                    "vol_usd": last_vol * last_price,
-                }
-        except Exception:
-            results[name] = {"price": None, "volume": None, "vol_chg": 0, "vol_usd": None}
-    return results
+@st.cache_resource(ttl=300, max_entries=2)
+def load_curve_fit(versions: tuple) -> CurveFit:
+    """Batch Nelson-Siegel fit of the whole yield cube for the given source versions."""
+    state = _curve_fit_state()
+    fit = fit_cube(load_yield_cube(versions), state.get("last"))
+    state["last"] = fit
+    return fit
+
+
+# ─────────────────────────────────────────────────────────────
+# DOWNSAMPLING
+# ─────────────────────────────────────────────────────────────
+
+CHART_WIDTH_PX = 1600   # assumed plot width of a full-width chart
+POINTS_PER_PX = 2       # a min and a max per pixel column
+
+
+def point_budget(width_frac: float = 1.0) -> int:
+    """Max points worth sending for a chart spanning width_frac of the page."""
+    return max(int(CHART_WIDTH_PX * width_frac * POINTS_PER_PX), 200)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points that preserve the
+    visual shape of the line (first and last point always kept).
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Indices of the min and max of each of n_buckets equal buckets, in order."""
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    padded = np.full(size * n_buckets, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    lo = offsets + np.nan_to_num(grid, nan=np.inf).argmin(1)
+    hi = offsets + np.nan_to_num(grid, nan=-np.inf).argmax(1)
+    return np.unique(np.clip(np.concatenate([lo, hi]), 0, n - 1))
+
+
+def downsample(series: pd.Series, n_out: int, method: str = "lttb") -> pd.Series:
+    """Reduce a series to about n_out points: 'lttb' for lines, 'minmax' for bars/spikes."""
+    s = series.dropna()
+    if len(s) <= n_out:
+        return s
+    y = s.to_numpy(dtype=float)
+    if method == "minmax":
+        idx = minmax_indices(y, n_out // 2)
+    else:
+        x = (s.index.asi8.astype(float) if isinstance(s.index, pd.DatetimeIndex)
+             else np.arange(len(s), dtype=float))
+        idx = lttb_indices(x, y, n_out)
+    return s.iloc[idx]
 
 
 # ─────────────────────────────────────────────────────────────
 # CHART HELPERS
 # ─────────────────────────────────────────────────────────────
 
+# Above this many points a line trace is drawn with WebGL instead of SVG
+WEBGL_MIN_POINTS = 1000
+
+
+def scatter(n_points: int, **kwargs):
+    """go.Scatter, or go.Scattergl once the trace is dense enough to slow SVG down."""
+    return (go.Scattergl if n_points > WEBGL_MIN_POINTS else go.Scatter)(**kwargs)
+
+
 PLOT_LAYOUT = dict(
     paper_bgcolor="#0a0a0f",
     plot_bgcolor="#0a0a0f",
@@ -442,15 +639,15 @@ PLOT_LAYOUT = dict(
 
 
 def line_chart(df: pd.DataFrame, cols: list, title: str, colors: list = None,
-               yformat: str = ".2f", height: int = 220) -> go.Figure:
+               yformat: str = ".2f", height: int = 220, width_frac: float = 1.0) -> go.Figure:
     """Generic multi-line chart."""
     fig = go.Figure()
     palette = colors or ["#f7941d", "#00d4ff", "#a855f7", "#fbbf24", "#00c27a", "#ff3d5a"]
     for i, col in enumerate(cols):
         if col in df.columns:
-            series = df[col].dropna()
-            fig.add_trace(go.Scatter(
-                x=series.index, y=series,
+            series = downsample(df[col], point_budget(width_frac))
+            fig.add_trace(scatter(
+                len(series), x=series.index, y=series,
                 name=col,
                 line=dict(color=palette[i % len(palette)], width=1.5),
                 mode="lines",
@@ -460,17 +657,43 @@ def line_chart(df: pd.DataFrame, cols: list, title: str, colors: list = None,
     return fig
 
 
-def spread_chart(s1: pd.Series, s2: pd.Series, label: str,
-                 color: str = "#00d4ff", height: int = 180) -> go.Figure:
-    """Plot spread (s1 - s2) in bps."""
-    spread = (s1 - s2).dropna() * 100  # assume yields in %, spread in bps
+def price_chart(df: pd.DataFrame, name: str, title: str, color: str,
+                height: int = 200, width_frac: float = 0.5) -> go.Figure:
+    """Single close-price line from an OHLCV frame."""
+    close = downsample(df["Close"], point_budget(width_frac))
+    fig = go.Figure()
+    fig.add_trace(scatter(len(close), x=close.index, y=close,
+                          line=dict(color=color, width=1.5), name=name))
+    fig.update_layout(**PLOT_LAYOUT, height=height,
+                      title=dict(text=title, font=dict(size=10, color="#9090a8"), x=0))
+    return fig
+
+
+def translucent(color: str, alpha: float = 0.08) -> str:
+    """rgba() of a "#rgb"/"#rrggbb" or "rgb(...)" colour at the given opacity."""
+    if color.startswith("#"):
+        h = color[1:] if len(color) == 7 else "".join(c * 2 for c in color[1:4])
+        return f"rgba({int(h[0:2], 16)},{int(h[2:4], 16)},{int(h[4:6], 16)},{alpha})"
+    if color.startswith("rgb("):
+        return f"rgba({color[4:-1]},{alpha})"
+    return color
+
+
+def spread_chart(s1: pd.Series, s2: pd.Series | None, label: str,
+                 color: str = "#00d4ff", height: int = 180, width_frac: float = 1.0) -> go.Figure:
+    """Plot spread (s1 - s2) in bps. With s2=None, s1 is already a spread in bps."""
+    if s2 is None:
+        spread = s1.dropna()
+    else:
+        spread = (s1 - s2).dropna() * 100  # assume yields in %, spread in bps
+    spread = downsample(spread, point_budget(width_frac))
     fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=spread.index, y=spread,
+    fig.add_trace(scatter(
+        len(spread), x=spread.index, y=spread,
         name=label,
         line=dict(color=color, width=1.5),
         fill="tozeroy",
-        fillcolor=color.replace(")", ", 0.08)").replace("rgb", "rgba") if "rgb" in color else f"rgba(0,212,255,0.08)",
+        fillcolor=translucent(color),
     ))
     fig.update_layout(**PLOT_LAYOUT, height=height,
                       title=dict(text=label, font=dict(size=10, color="#9090a8"), x=0))
@@ -492,6 +715,21 @@ def bar_chart(labels: list, values: list, colors: list, title: str, height: int
     return fig
 
 
+def corr_heatmap(corr: pd.DataFrame, title: str, height: int = 560) -> go.Figure:
+    """Correlation matrix heatmap: red at -1, background at 0, green at +1."""
+    fig = go.Figure(go.Heatmap(
+        z=corr.to_numpy(), x=list(corr.columns), y=list(corr.index), zmin=-1, zmax=1,
+        colorscale=[[0, COLORS["red"]], [0.5, COLORS["bg"]], [1, COLORS["green"]]],
+        hovertemplate="%{y} / %{x}: %{z:.2f}<extra></extra>",
+        colorbar=dict(thickness=8, tickfont=dict(size=8)),
+    ))
+    fig.update_layout(**{**PLOT_LAYOUT, "hovermode": "closest"}, height=height,
+                      title=dict(text=title, font=dict(size=10, color="#9090a8"), x=0))
+    fig.update_xaxes(showgrid=False, tickfont=dict(size=8), tickangle=-45)
+    fig.update_yaxes(showgrid=False, tickfont=dict(size=8), autorange="reversed")
+    return fig
+
+
 # ─────────────────────────────────────────────────────────────
 # UI COMPONENTS
 # ─────────────────────────────────────────────────────────────
@@ -512,26 +750,169 @@ def render_ticker_card(label: str, data: dict, decimals: int = 2, suffix: str =
         chg_str = f"{sign} {abs(pct):.2f}% ({chg:+.{decimals}f})"
         cls = "ticker-change-pos" if pct > 0 else ("ticker-change-neg" if pct < 0 else "ticker-change-neu")
 
+    subs = []
+    if price is not None and "open_pct" in data:
+        subs.append(f"vs session open {data['open_pct']:+.2f}%")
+    if bar := data.get("bar"):
+        subs.append(f"● live · {STREAM_BAR_SECONDS // 60}m H {bar['high']:,.{decimals}f} "
+                    f"L {bar['low']:,.{decimals}f} · {bar['ticks']} ticks")
+    sub = "".join(f'<div class="ticker-sub">{s}</div>' for s in subs)
+    st.markdown(f"""
+    <div class="ticker-card">
+        <div class="ticker-label">{label}</div>
+        <div class="ticker-value">{price_str}</div>
+        <div class="{cls}">{chg_str}</div>{sub}
+    </div>""", unsafe_allow_html=True)
 
-def section(title: str):
-    st.markdown(f'<div class="section-header">◈ {title}</div>', unsafe_allow_html=True)
+
+CARDS_PER_ROW = 6        # ticker cards per row before a group wraps
+GROUP_CARD_LIMIT = 36    # a row with more instruments renders as one table instead of cards
 
 
-def compute_curve_spread(yields: dict, country: str, t1: str, t2: str) -> float | None:
-    """Yield curve spread t2 - t1 in bps."""
-    c = yields.get(country, {})
-    if t1 in c and t2 in c:
-        return (c[t2] - c[t1]) * 100
-    return None
+def card_columns(n: int):
+    """One st.columns cell per card for n cards, wrapping every CARDS_PER_ROW."""
+    width = min(n, CARDS_PER_ROW)
+    for start in range(0, n, width or 1):
+        yield from st.columns(width)[:n - start]
 
 
-def compute_box(yields: dict, c1: str, c2: str, t1: str, t2: str) -> float | None:
-    """Box spread = (c1 curve slope) - (c2 curve slope), in bps."""
-    s1 = compute_curve_spread(yields, c1, t1, t2)
-    s2 = compute_curve_spread(yields, c2, t1, t2)
-    if s1 is not None and s2 is not None:
-        return s1 - s2
-    return None
+def quote_table(items: list, quotes: dict) -> pd.DataFrame:
+    """Price / change table of universe instruments, for rows too long for cards."""
+    q = [quotes.get(i["label"], {}) for i in items]
+    return pd.DataFrame({"Symbol": [i["symbol"] for i in items],
+                         "Price": [x.get("price") for x in q],
+                         "Chg": [x.get("chg") if x.get("ok") else None for x in q],
+                         "%": [x.get("pct") if x.get("ok") else None for x in q]},
+                        index=pd.Index([i["label"] for i in items], name="Instrument"))
+
+
+def render_group(group: str, quotes: dict):
+    """A universe group's ticker cards under their row titles, with the decimals and suffix configured."""
+    for row, items in group_rows(group).items():
+        if row:
+            st.markdown(f"**{row}**")
+        if len(items) > GROUP_CARD_LIMIT:
+            st.dataframe(quote_table(items, quotes), use_container_width=True)
+            continue
+        for col, item in zip(card_columns(len(items)), items):
+            with col:
+                render_ticker_card(item["label"], quotes.get(item["label"], {}),
+                                   decimals=item["decimals"], suffix=item["suffix"])
+
+
+STREAM_TILE_REFRESH = 0.5   # seconds between repaints of the streamed tiles
+
+
+def live_tile_row(tiles: list):
+    """
+    Ticker tiles, wrapped every CARDS_PER_ROW: [(label, symbol, snapshot quote, render_ticker_card kwargs)].
+    While the quote stream is live the row is its own fragment, repainted every
+    STREAM_TILE_REFRESH s from the tick rings without rerunning its section.
+    """
+    stream = quote_stream()
+
+    def paint():
+        live = stream is not None and stream.live
+        for col, (label, sym, quote, kwargs) in zip(card_columns(len(tiles)), tiles):
+            with col:
+                render_ticker_card(label, stream_quote(quote, stream.rings.get(sym)) if live else quote, **kwargs)
+
+    if stream is not None and stream.live:
+        st.fragment(run_every=STREAM_TILE_REFRESH)(paint)()
+    else:
+        paint()
+
+
+# (section, data version, shared) of the section currently rendering — see memo()
+_memo_scope = contextvars.ContextVar("memo_scope", default=None)
+
+FIGURE_CACHE_SIZE = 256
+
+
+class FigureCache:
+    """Built figures as Plotly JSON, shared by every session, least recently used evicted first."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def get(self, key, build):
+        with self._lock:
+            spec = self._items.get(key)
+            if spec is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return spec
+        # Built outside the lock; two sessions racing on a miss both build once
+        spec = build()
+        with self._lock:
+            self.misses += 1
+            self._items[key] = spec
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return spec
+
+
+@st.cache_resource
+def figure_cache() -> FigureCache:
+    return FigureCache(FIGURE_CACHE_SIZE)
+
+
+@contextlib.contextmanager
+def figure_scope(section_name: str, version, shared: bool = True):
+    """
+    Render a section's figures against a data version: memo() reuses any
+    figure already built for it. Sections fed by session-specific data
+    (shared=False) keep their figures in session state instead.
+    """
+    token = _memo_scope.set((section_name, version, shared))
+    try:
+        yield
+    finally:
+        _memo_scope.reset(token)
+
+
+def memo(key: str, build):
+    """
+    Return build(), reusing a figure already built for the same chart key and
+    data version of the section being rendered. The key must name everything
+    else the figure depends on (selected tenors, countries, ...). Figures are
+    kept as JSON and thawed into a fresh, unvalidated go.Figure per render —
+    it was validated when built.
+    """
+    scope = _memo_scope.get()
+    if scope is None:
+        return build()
+    section_name, version, shared = scope
+    built = []
+
+    def timed_build():
+        started = time.perf_counter()
+        spec = build().to_json()
+        built.append((time.perf_counter() - started) * 1000)
+        return spec
+
+    started = time.perf_counter()
+    if shared:
+        spec = figure_cache().get((section_name, key, version), timed_build)
+    else:
+        store = st.session_state.setdefault("_section_memo", {})
+        hit = store.get((section_name, key))
+        if hit is None or hit[0] != version:
+            hit = store[(section_name, key)] = (version, timed_build())
+        spec = hit[1]
+    fig = go.Figure(json.loads(spec), _validate=False)
+    metrics().record("figure", f"{section_name}/{key}",
+                     built[0] if built else (time.perf_counter() - started) * 1000, not built,
+                     rows=sum(len(t.x) for t in fig.data if isinstance(t.x, (list, tuple))))
+    return fig
+
+
+def section(title: str):
+    st.markdown(f'<div class="section-header">◈ {title}</div>', unsafe_allow_html=True)
 
 
 def fmt_bp(val) -> str:
@@ -548,128 +929,279 @@ def fmt_yield(val) -> str:
 
 
 # ─────────────────────────────────────────────────────────────
-# MAIN APP
+# BACKGROUND REFRESHER
 # ─────────────────────────────────────────────────────────────
 
-def main():
+# Poll interval per source (seconds) — the same cadence as the fetchers' TTLs
+REFRESH_SCHEDULE = {
+    "yahoo":       60,
+    "history":     60,
+    "intraday":    60,
+    "cross_asset": 300,
+    "ecb":         300,
+    "fred":        300,
+    "coingecko":   120,
+    "etf":         300,
+}
 
-    # ── Top bar ──
-    now = datetime.utcnow().strftime("%Y-%m-%d  %H:%M:%S UTC")
-    st.markdown(f"""
-    <div class="top-bar">
-        <span class="top-bar-title">◈ MACRO TERMINAL · GLOBAL MARKETS</span>
-        <span class="top-bar-time">🕐 {now} · Auto-refresh every 60s</span>
-    </div>
-    """, unsafe_allow_html=True)
+# Jobs polled only while a session asks for them (Refresher.request): intraday bars
+# cost a download per symbol, worth it only while someone is in 1m/5m mode
+ON_DEMAND_JOBS = ("intraday",)
+ON_DEMAND_IDLE = 300   # seconds an on-demand job keeps polling after the last request
+
+# The refresher wants current data, not stale-while-revalidate: it is what revalidates the board
+REFRESH_JOBS = {
+    "yahoo":       lambda: fetch_yf_universe.fresh(SNAPSHOT_SYMBOLS),
+    "history":     lambda: fetch_yf_histories.fresh(HISTORY_TICKERS),
+    "intraday":    fetch_intraday,
+    "cross_asset": fetch_cross_asset,
+    "ecb":         lambda: fetch_ecb_yields.fresh(),
+    "fred":        lambda: fetch_fred_yields.fresh(os.environ.get("FRED_API_KEY", "")),
+    "coingecko":   lambda: fetch_coingecko.fresh(),
+    "etf":         lambda: fetch_etf_flows.fresh(BTC_ETFS),
+}
 
-    # ── Sidebar config ──
-    with st.sidebar:
-        st.markdown("### ⚙ Settings")
-        fred_key = st.text_input("FRED API Key (optional)", type="password",
-                                 help="Get free key at fred.stlouisfed.org/docs/api")
-        auto_refresh = st.checkbox("Auto-refresh (60s)", value=False)
-        period = st.selectbox("Chart lookback", ["1mo", "3mo", "6mo", "1y", "2y"], index=2)
-        st.markdown("---")
-        st.markdown("### 📋 ASW Manual Input")
-        st.markdown("*Enter values from Bloomberg/SEB (bps)*")
-        asw_du  = st.number_input("DU ASW (2Y Schatz)", value=0.0, step=0.1, format="%.1f")
-        asw_oe  = st.number_input("OE ASW (5Y Bobl)",   value=0.0, step=0.1, format="%.1f")
-        asw_rx  = st.number_input("RX ASW (10Y Bund)",  value=0.0, step=0.1, format="%.1f")
-        asw_ub  = st.number_input("UB ASW (30Y Buxl)",  value=0.0, step=0.1, format="%.1f")
-        st.markdown("---")
-        st.markdown("### 📂 ASW Bulk Upload")
-        uploaded = st.file_uploader("Upload ASW CSV (BBG/SEB export)", type=["csv"])
-        if uploaded:
-            asw_df = pd.read_csv(uploaded)
-            st.dataframe(asw_df.tail(10), height=150)
 
-    # Auto-refresh
-    if auto_refresh:
-        time.sleep(1)
-        st.rerun()
+# Sources the local store can answer on its own: published before the first poll,
+# so a restart paints stored data without waiting on upstream
+STORE_READERS = {
+    "history": lambda: core.stored_yf_histories(HISTORY_TICKERS),
+    "ecb":     core.stored_ecb_yields,
+    "fred":    core.stored_fred_yields,
+}
 
-    # ── Fetch data ──
-    with st.spinner("Fetching market data..."):
-        eq_data     = fetch_yf_snapshot(EQUITIES)
-        fx_data     = fetch_yf_snapshot(FX)
-        commo_data  = fetch_yf_snapshot(COMMODITIES)
-        future_data = fetch_yf_snapshot(EUREX_FUTURES)
-        ecb_yields  = fetch_ecb_yields()
-        us_yields   = fetch_fred_yields(fred_key)
-        cg_data     = fetch_coingecko()
-        etf_flows   = fetch_etf_volumes(BTC_ETFS)
 
+def _has_values(obj) -> bool:
+    """Whether a fetch result holds any usable value: a quote marked ok, a non-NaN number."""
+    if isinstance(obj, pd.DataFrame):
+        return bool(obj["ok"].any()) if "ok" in obj else bool(obj.notna().to_numpy().any())
+    if isinstance(obj, pd.Series):
+        return bool(obj.notna().any())
+    if isinstance(obj, dict):
+        return any(_has_values(v) for v in obj.values())
+    return obj is not None and not (isinstance(obj, float) and np.isnan(obj))
+
+
+def _fingerprint(obj, h=None):
+    """Digest of a fetch result's content: equal data, equal digest, across refreshes."""
+    h = h or hashlib.sha1()
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(repr(list(obj.columns) if isinstance(obj, pd.DataFrame) else obj.name).encode())
+        h.update(pd.util.hash_pandas_object(obj).to_numpy().tobytes())
+    elif isinstance(obj, dict):
+        for k, v in obj.items():
+            h.update(repr(k).encode())
+            _fingerprint(v, h)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            _fingerprint(v, h)
+    else:
+        h.update(repr(obj).encode())
+    return h.hexdigest()
+
+
+class SnapshotBoard:
+    """
+    Latest published result of every source, shared by all sessions:
+    {"data", "status", "version", "at", "good_at"} per source, good_at
+    being when the data was last fetched healthy (None if never). version
+    only moves when the data or status does, so sections keep their figures.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._entries = {}
+
+    def publish(self, source: str, data, status: dict):
+        with self._cond:
+            prev = self._entries.get(source)
+            # A degraded result (its upstream failed recently, the breaker still closed) is
+            # current data and goes out with its badge; a refresh that produced nothing
+            # usable (errors, an open breaker, an all-NaN frame) keeps the last good data
+            failed = (status["state"] in ("error", "timeout")
+                      or status.get("breaker") in ("open", "half_open")
+                      or not _has_values(data))
+            if failed and prev is not None:
+                data = prev["data"]
+            now = time.time()
+            try:
+                digest = (_fingerprint(data), _fingerprint({k: v for k, v in status.items() if k != "elapsed"}))
+            except Exception:
+                digest = None   # unhashable content: treat it as changed
+            if prev is not None and digest is not None and digest == prev["digest"]:
+                data, version = prev["data"], prev["version"]
+            else:
+                version = (prev["version"] + 1) if prev else 1
+            self._entries[source] = {
+                "data": data,
+                "status": status,
+                "digest": digest,
+                "version": version,
+                "at": now,
+                "good_at": now if status["state"] == "ok" else (prev["good_at"] if prev else None),
+            }
+            self._cond.notify_all()
+
+    def get(self, source: str) -> dict | None:
+        with self._cond:
+            return self._entries.get(source)
+
+    def wait_for(self, sources: list, timeout: float):
+        """Yield (source, entry) as each source becomes available, until timeout."""
+        deadline = time.monotonic() + timeout
+        remaining = list(sources)
+        while remaining:
+            with self._cond:
+                ready = [(s, self._entries[s]) for s in remaining if s in self._entries]
+                if not ready:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        return
+                    self._cond.wait(left)
+                    continue
+            for source, entry in ready:
+                remaining.remove(source)
+                yield source, entry
+
+
+class Refresher:
+    """
+    Polls every source on its own schedule from daemon threads and publishes
+    the results to a SnapshotBoard. Sessions only read the board, so page
+    render time no longer depends on upstream latency. On-demand jobs sleep
+    until request() and stop again ON_DEMAND_IDLE after the last one.
+    """
+
+    def __init__(self, jobs: dict, schedule: dict, readers: dict = None, on_demand=()):
+        self.board = SnapshotBoard()
+        self._jobs, self._schedule = jobs, schedule
+        self._requested = {name: None for name in on_demand}
+        self._wanted = {name: threading.Event() for name in on_demand}
+        for name, read in (readers or {}).items():
+            try:
+                data = read()
+            except Exception:
+                continue
+            if _row_count(data):   # an empty store would only stand in for the first fetch
+                self.board.publish(name, data, {"state": "stored", "elapsed": 0.0})
+        self._threads = [
+            threading.Thread(target=self._poll, args=(name,), name=f"refresh-{name}", daemon=True)
+            for name in jobs
+        ]
+        for t in self._threads:
+            t.start()
+
+    def request(self, name: str):
+        """Keep an on-demand job polling for another ON_DEMAND_IDLE seconds."""
+        if name in self._requested:
+            self._requested[name] = time.monotonic()
+            self._wanted[name].set()
+
+    def _demanded(self, name: str) -> bool:
+        at = self._requested.get(name, 0.0)
+        return at is not None and time.monotonic() - at < ON_DEMAND_IDLE
+
+    def active(self) -> list:
+        """Jobs polling now: every scheduled job, and the on-demand ones someone asked for."""
+        return [name for name in self._jobs if name not in self._requested or self._demanded(name)]
+
+    def _poll(self, name: str):
+        while True:
+            while name in self._requested and not self._demanded(name):
+                self._wanted[name].clear()
+                if not self._demanded(name):
+                    self._wanted[name].wait()
+            started = time.monotonic()
+            for source, result, status in run_sources({name: self._jobs[name]},
+                                                      SOURCE_DEADLINES, SOURCE_DEFAULTS):
+                self.board.publish(source, result, status)
+            time.sleep(max(self._schedule[name] - (time.monotonic() - started), 1))
+
+
+@st.cache_resource
+def refresher() -> Refresher:
+    """Started once per server process; shared by every session."""
+    return Refresher(REFRESH_JOBS, REFRESH_SCHEDULE, STORE_READERS, ON_DEMAND_JOBS)
+
+
+def render_source_status(entries: dict):
+    """One-line per-source refresh status: ✓ ok, ✗ error, ⏱ timeout, plus data age."""
+    icons = {"ok": "✓", "error": "✗", "timeout": "⏱", "degraded": "⚠", "stored": "◌"}
+    now = time.time()
+    parts = [f"{name} {icons[e['status']['state']]} {e['status']['elapsed']:.1f}s · {now - e['at']:.0f}s ago"
+             for name, e in entries.items()]
+    st.caption("Sources · " + " · ".join(parts))
+
+
+def render_degraded_badge(entries: dict):
+    """Badge under a section whose sources are showing last-known-good data."""
+    parts = []
+    for name, e in entries.items():
+        if e is None or e["status"]["state"] == "ok":
+            continue
+        state = e["status"].get("breaker", e["status"]["state"]).replace("_", "-")
+        good = (f"last good {datetime.fromtimestamp(e['good_at'], tz=timezone.utc):%H:%M:%S} UTC"
+                if e["good_at"] else "no healthy fetch yet")
+        parts.append(f"{name} {state} · {good}")
+    if parts:
+        st.caption("⚠ Degraded · " + " · ".join(parts))
+
+
+# ─────────────────────────────────────────────────────────────
+# SECTIONS
+# ─────────────────────────────────────────────────────────────
+
+def render_equities(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 1. EQUITIES
     # ════════════════════════════════════════════════════════
+    eq_data = snapshot_slice(data["yahoo"], EQUITIES)
     section("EQUITIES")
 
-    st.markdown("**🇪🇺 Europe**")
-    eu_indices = ["EURO STOXX 50", "DAX", "CAC 40", "FTSE 100", "IBEX 35", "FTSE MIB"]
-    cols = st.columns(len(eu_indices))
-    for i, idx in enumerate(eu_indices):
-        with cols[i]:
-            render_ticker_card(idx, eq_data.get(idx, {}), decimals=0)
-
-    st.markdown("**🇺🇸 United States**")
-    us_indices = ["S&P 500", "NASDAQ 100", "DOW JONES", "RUSSELL 2000"]
-    cols = st.columns(4)
-    for i, idx in enumerate(us_indices):
-        with cols[i]:
-            render_ticker_card(idx, eq_data.get(idx, {}), decimals=0)
-
-    st.markdown("**🌏 Asia**")
-    as_indices = ["NIKKEI 225", "HANG SENG", "CSI 300", "KOSPI"]
-    cols = st.columns(4)
-    for i, idx in enumerate(as_indices):
-        with cols[i]:
-            render_ticker_card(idx, eq_data.get(idx, {}), decimals=0)
+    render_group("equities", eq_data)
 
     # Equity bar chart
     pcts = [eq_data.get(k, {}).get("pct") for k in list(EQUITIES.keys())]
     colors_eq = [COLORS["green"] if (p or 0) >= 0 else COLORS["red"] for p in pcts]
-    fig_eq = bar_chart(list(EQUITIES.keys()), pcts, colors_eq, "Daily % Change — All Indices", height=220)
+    fig_eq = memo("fig_eq", lambda: bar_chart(list(EQUITIES.keys()), pcts, colors_eq,
+                                              "Daily % Change — All Indices", height=220))
     st.plotly_chart(fig_eq, use_container_width=True, config={"displayModeBar": False})
 
+
+def render_eurex(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 2. RATES — EUR FUTURES (EUREX)
     # ════════════════════════════════════════════════════════
+    future_data = snapshot_slice(data["yahoo"], EUREX_FUTURES)
+    history = data["history"]
     section("RATES · EUR FUTURES (EUREX)")
 
-    cols = st.columns(4)
-    for i, (name, ticker) in enumerate(EUREX_FUTURES.items()):
-        with cols[i]:
-            render_ticker_card(name, future_data.get(name, {}), decimals=3)
+    render_group("eurex", future_data)
 
     # Historical charts
     col1, col2 = st.columns(2)
     with col1:
-        df_rx = fetch_yf_history("FGBL=F", period)
+        df_rx = slice_period(history.get("FGBL=F", pd.DataFrame()), period)
         if not df_rx.empty:
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df_rx.index, y=df_rx["Close"],
-                                     line=dict(color=COLORS["accent"], width=1.5), name="Bund (RX)"))
-            fig.update_layout(**PLOT_LAYOUT, height=200,
-                              title=dict(text="Bund Future (RX) — Price", font=dict(size=10, color="#9090a8"), x=0))
+            fig = memo("df_rx", lambda: price_chart(df_rx, "Bund (RX)", "Bund Future (RX) — Price", COLORS["accent"]))
             st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
 
     with col2:
-        df_du = fetch_yf_history("FGBS=F", period)
+        df_du = slice_period(history.get("FGBS=F", pd.DataFrame()), period)
         if not df_du.empty:
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df_du.index, y=df_du["Close"],
-                                     line=dict(color=COLORS["accent2"], width=1.5), name="Schatz (DU)"))
-            fig.update_layout(**PLOT_LAYOUT, height=200,
-                              title=dict(text="Schatz Future (DU) — Price", font=dict(size=10, color="#9090a8"), x=0))
+            fig = memo("df_du", lambda: price_chart(df_du, "Schatz (DU)", "Schatz Future (DU) — Price", COLORS["accent2"]))
             st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
 
+
+def render_sovereign(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 3. YIELD CURVES + SOVEREIGN SPREADS
     # ════════════════════════════════════════════════════════
+    ecb_yields, us_yields = data["ecb"], data["fred"]
     section("SOVEREIGN YIELDS & SPREADS")
 
     # ── Yield table ──
-    tenors = ["2Y", "5Y", "10Y", "30Y"]
+    tenors = TENORS
     yield_rows = []
     for country, fullname in ECB_COUNTRIES.items():
         row = {"Country": fullname}
@@ -687,22 +1219,20 @@ def main():
 
     df_yields = pd.DataFrame(yield_rows).set_index("Country")
     st.dataframe(df_yields, use_container_width=True)
+    ecb_stats = fetch_stats().get("ecb")
+    if ecb_stats:
+        st.caption(f"ECB SDW · {ecb_stats['round_trips']} round-trip(s) on last refresh "
+                   f"({ecb_stats['at'].strftime('%H:%M:%S')} UTC)")
 
     # ── OAT-Bund, BTP-Bund, Gilt-Bund spreads ──
     st.markdown("**Sovereign Spreads vs Bund (bps)**")
-    spread_pairs = [
-        ("OAT-Bund", "FR", "DE"),
-        ("BTP-Bund",  "IT", "DE"),
-        ("BONOS-Bund","ES", "DE"),
-    ]
+    spread_pairs = SOVEREIGN_SPREADS
     cols = st.columns(3)
     for i, (label, c1, c2) in enumerate(spread_pairs):
         with cols[i]:
             for t in tenors:
-                v1 = ecb_yields.get(c1, {}).get(t)
-                v2 = ecb_yields.get(c2, {}).get(t)
-                if v1 and v2:
-                    bp = (v1 - v2) * 100
+                bp = compute_country_spread(ecb_yields, c1, c2, t)
+                if bp is not None:
                     col_cls = "ticker-change-pos" if bp > 0 else "ticker-change-neg"
                     st.markdown(f"""
                     <div class="spread-card">
@@ -710,58 +1240,121 @@ def main():
                         <div class="spread-val" style="color: {'#ff3d5a' if bp > 0 else '#00c27a'}">{bp:+.1f} bp</div>
                     </div>""", unsafe_allow_html=True)
 
+    # ── Spread history (10Y) from the yield cube ──
+    cube = load_yield_cube(source_versions("ecb", "fred"))
+    cols = st.columns(3)
+    for i, (label, c1, c2) in enumerate(spread_pairs):
+        hist = slice_period(cube.spread(c1, c2, "10Y"), period)
+        if not hist.empty:
+            with cols[i]:
+                fig = memo(f"spread_{label}", lambda: spread_chart(hist, None, f"{label} 10Y — History",
+                                                                   color=COLORS[c1], width_frac=1 / 3))
+                st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+
+
+def render_curves(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 4. YIELD CURVES — SHAPE
     # ════════════════════════════════════════════════════════
+    ecb_yields, us_yields = data["ecb"], data["fred"]
+    tenors = TENORS
     section("YIELD CURVES — SHAPE")
 
-    col1, col2 = st.columns(2)
-    with col1:
-        # EUR curves plot
+    # Nelson-Siegel fit of today's points, smooth from 1Y to 30Y
+    tenor_vals = [2, 5, 10, 30]
+    tau_grid = np.linspace(1, 30, 59)
+    today = {**ecb_yields, "US": us_yields}
+    fit_countries = ["DE", "FR", "IT", "ES", "US"]
+    points = np.array([[today.get(c, {}).get(t, np.nan) for t in tenors] for c in fit_countries],
+                      dtype=float)
+    params = dict(zip(fit_countries, fit_nelson_siegel(tenor_vals, points)))
+
+    def add_curve(fig, country, name, color):
+        y_vals = [today.get(country, {}).get(t) for t in tenors]
+        if not any(v is not None for v in y_vals):
+            return
+        if np.isfinite(params[country]).all():
+            fig.add_trace(go.Scatter(
+                x=tau_grid, y=ns_yield(params[country], tau_grid),
+                name=name, legendgroup=country,
+                line=dict(color=color, width=2), mode="lines",
+            ))
+        fig.add_trace(go.Scatter(
+            x=tenor_vals, y=y_vals,
+            name=name, legendgroup=country, showlegend=not np.isfinite(params[country]).all(),
+            line=dict(color=color, width=2),
+            mode="markers" if np.isfinite(params[country]).all() else "lines+markers",
+            marker=dict(size=5),
+        ))
+
+    def build_eur_curves():
         fig_eur = go.Figure()
-        tenor_vals = [2, 5, 10, 30]
         for country, color in [("DE", COLORS["DE"]), ("FR", COLORS["FR"]),
                                  ("IT", COLORS["IT"]), ("ES", COLORS["ES"])]:
-            ys = ecb_yields.get(country, {})
-            y_vals = [ys.get(t) for t in tenors]
-            if any(v is not None for v in y_vals):
-                fig_eur.add_trace(go.Scatter(
-                    x=tenor_vals, y=y_vals,
-                    name=ECB_COUNTRIES[country],
-                    line=dict(color=color, width=2),
-                    mode="lines+markers",
-                    marker=dict(size=5),
-                ))
+            add_curve(fig_eur, country, ECB_COUNTRIES[country], color)
         fig_eur.update_layout(**PLOT_LAYOUT, height=250,
                               title=dict(text="EUR Sovereign Yield Curves", font=dict(size=10, color="#9090a8"), x=0))
         fig_eur.update_xaxes(tickvals=[2,5,10,30], ticktext=["2Y","5Y","10Y","30Y"])
         fig_eur.update_yaxes(tickformat=".2f", ticksuffix="%")
-        st.plotly_chart(fig_eur, use_container_width=True, config={"displayModeBar": False})
+        return fig_eur
 
-    with col2:
-        # US curve plot
+    def build_us_curve():
         fig_us = go.Figure()
-        us_y = [us_yields.get(t) for t in tenors]
-        if any(v is not None for v in us_y):
-            fig_us.add_trace(go.Scatter(
-                x=tenor_vals, y=us_y,
-                name="US Treasuries",
-                line=dict(color=COLORS["US"], width=2),
-                mode="lines+markers",
-                marker=dict(size=5),
-            ))
+        add_curve(fig_us, "US", "US Treasuries", COLORS["US"])
         fig_us.update_layout(**PLOT_LAYOUT, height=250,
                               title=dict(text="US Treasury Yield Curve", font=dict(size=10, color="#9090a8"), x=0))
         fig_us.update_xaxes(tickvals=[2,5,10,30], ticktext=["2Y","5Y","10Y","30Y"])
         fig_us.update_yaxes(tickformat=".2f", ticksuffix="%")
-        st.plotly_chart(fig_us, use_container_width=True, config={"displayModeBar": False})
+        return fig_us
 
+    col1, col2 = st.columns(2)
+    with col1:
+        # EUR curves plot
+        st.plotly_chart(memo("fig_eur", build_eur_curves), use_container_width=True,
+                        config={"displayModeBar": False})
+    with col2:
+        # US curve plot
+        st.plotly_chart(memo("fig_us", build_us_curve), use_container_width=True,
+                        config={"displayModeBar": False})
+
+    # ── Fitted points off the quoted grid ──
+    names = {**ECB_COUNTRIES, "US": "United States"}
+    fitted_rows = []
+    for country in fit_countries:
+        p = params[country]
+        if not np.isfinite(p).all():
+            continue
+        y5, y10, y20 = ns_yield(p, 5.0), ns_yield(p, 10.0), ns_yield(p, 20.0)
+        fitted_rows.append({
+            "Country": names[country],
+            "7Y": fmt_yield(float(ns_yield(p, 7.0))),
+            "20Y": fmt_yield(float(y20)),
+            "5y5y fwd": fmt_yield(float((y10 * 10 - y5 * 5) / 5)),
+            "10y10y fwd": fmt_yield(float((y20 * 20 - y10 * 10) / 10)),
+        })
+    if fitted_rows:
+        st.markdown("**Nelson-Siegel Fitted Points**")
+        st.dataframe(pd.DataFrame(fitted_rows).set_index("Country"), use_container_width=True)
+
+    # ── 5y5y forward history from the batch fit ──
+    curve_fit = load_curve_fit(source_versions("ecb", "fred"))
+    fwd = slice_period(curve_fit.forward(5.0, 5.0)[fit_countries].dropna(how="all"), period)
+    if not fwd.empty:
+        fwd = fwd.rename(columns=names)
+        fig = memo("fig_fwd", lambda: line_chart(
+            fwd, fwd.columns.tolist(), "5y5y Forward — Nelson-Siegel Fitted History",
+            colors=[COLORS[c] for c in fit_countries], height=220))
+        st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+
+
+def render_curve_spreads(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 5. CURVE SPREADS TABLE (2s5s, 5s10s, 10s30s)
     # ════════════════════════════════════════════════════════
+    ecb_yields, us_yields = data["ecb"], data["fred"]
     section("CURVE SPREADS (bps)")
 
-    spreads_def = [("2s5s", "2Y", "5Y"), ("5s10s", "5Y", "10Y"), ("2s10s", "2Y", "10Y"), ("10s30s", "10Y", "30Y")]
+    spreads_def = SPREADS_DEF
     curve_rows = []
 
     for country, fullname in [("DE","Germany"), ("FR","France"), ("IT","Italy"), ("ES","Spain")]:
@@ -774,7 +1367,6 @@ def main():
     # US
     if us_yields:
         row = {"Country": "United States"}
-        fake_us = {"US": us_yields}
         for label, t1, t2 in spreads_def:
             v1, v2 = us_yields.get(t1), us_yields.get(t2)
             val = (v2 - v1) * 100 if v1 and v2 else None
@@ -784,20 +1376,36 @@ def main():
     df_curves = pd.DataFrame(curve_rows).set_index("Country")
     st.dataframe(df_curves, use_container_width=True)
 
+    # ── Curve spread history ──
+    cube = load_yield_cube(source_versions("ecb", "fred"))
+    names = {**ECB_COUNTRIES, "US": "United States"}
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        country = st.selectbox("Country", ["DE", "FR", "IT", "ES", "US"], format_func=names.get,
+                               key="curve_hist_country")
+        label = st.selectbox("Spread", [d[0] for d in SPREADS_DEF], index=2, key="curve_hist_spread")
+        _, t1, t2 = next(d for d in SPREADS_DEF if d[0] == label)
+    with col2:
+        hist = slice_period(cube.slope(country, t1, t2), period)
+        if not hist.empty:
+            fig = memo(f"slope_{country}_{label}",
+                       lambda: spread_chart(hist, None, f"{names[country]} {label} — History",
+                                            width_frac=0.75))
+            st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+
+
+def render_boxes(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 6. BOX SPREADS
     # ════════════════════════════════════════════════════════
+    ecb_yields = data["ecb"]
     section("BOX SPREADS (bps) — Curve Slope Differentials")
 
-    box_configs = [
-        ("FR-DE", "FR", "DE"),
-        ("IT-DE", "IT", "DE"),
-        ("ES-DE", "ES", "DE"),
-    ]
+    box_configs = BOX_PAIRS
     box_rows = []
     for label, c1, c2 in box_configs:
         row = {"Box": label}
-        for sp_label, t1, t2 in spreads_def:
+        for sp_label, t1, t2 in SPREADS_DEF:
             val = compute_box(ecb_yields, c1, c2, t1, t2)
             row[sp_label] = fmt_bp(val)
         box_rows.append(row)
@@ -805,6 +1413,24 @@ def main():
     df_box = pd.DataFrame(box_rows).set_index("Box")
     st.dataframe(df_box, use_container_width=True)
 
+    # ── Box history ──
+    cube = load_yield_cube(source_versions("ecb", "fred"))
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        box_label = st.selectbox("Box", [b[0] for b in box_configs], key="box_hist_pair")
+        sp_label = st.selectbox("Slope", [d[0] for d in SPREADS_DEF], index=2, key="box_hist_slope")
+        _, c1, c2 = next(b for b in box_configs if b[0] == box_label)
+        _, t1, t2 = next(d for d in SPREADS_DEF if d[0] == sp_label)
+    with col2:
+        hist = slice_period(cube.box(c1, c2, t1, t2), period)
+        if not hist.empty:
+            fig = memo(f"box_{box_label}_{sp_label}",
+                       lambda: spread_chart(hist, None, f"{box_label} {sp_label} Box — History",
+                                            color=COLORS[c1], width_frac=0.75))
+            st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+
+
+def render_rate_expectations():
     # ════════════════════════════════════════════════════════
     # 7. RATE EXPECTATIONS — ECB & FED
     # ════════════════════════════════════════════════════════
@@ -846,17 +1472,15 @@ def main():
         st.dataframe(df_fed, hide_index=True, use_container_width=True)
         st.caption("⚠ Static estimates — connect to CME/Bloomberg for live strip")
 
+
+def render_asw(asw_values: dict, asw_df: pd.DataFrame | None):
     # ════════════════════════════════════════════════════════
     # 8. ASW (ASSET SWAP SPREADS)
     # ════════════════════════════════════════════════════════
     section("ASSET SWAP SPREADS (bps) — SEB / Bloomberg Input")
 
-    asw_values = {
-        "DU ASW (2Y)": asw_du,
-        "OE ASW (5Y)": asw_oe,
-        "RX ASW (10Y)": asw_rx,
-        "UB ASW (30Y)": asw_ub,
-    }
+    asw_du, asw_oe = asw_values["DU ASW (2Y)"], asw_values["OE ASW (5Y)"]
+    asw_rx, asw_ub = asw_values["RX ASW (10Y)"], asw_values["UB ASW (30Y)"]
 
     col1, col2 = st.columns([1, 2])
     with col1:
@@ -874,72 +1498,69 @@ def main():
             "DU-RX ASW": asw_du - asw_rx,
             "OE-RX ASW": asw_oe - asw_rx,
         }
-        fig_asw = go.Figure(go.Bar(
-            x=list(asw_curve.keys()),
-            y=list(asw_curve.values()),
-            marker_color=[COLORS["green"] if v >= 0 else COLORS["red"] for v in asw_curve.values()],
-            text=[f"{v:+.1f} bp" for v in asw_curve.values()],
-            textposition="outside",
-        ))
-        fig_asw.update_layout(**PLOT_LAYOUT, height=200,
-                              title=dict(text="ASW Curve Spreads", font=dict(size=10, color="#9090a8"), x=0))
-        fig_asw.update_yaxes(tickformat=".1f", ticksuffix=" bp")
+
+        def build_asw():
+            fig_asw = go.Figure(go.Bar(
+                x=list(asw_curve.keys()),
+                y=list(asw_curve.values()),
+                marker_color=[COLORS["green"] if v >= 0 else COLORS["red"] for v in asw_curve.values()],
+                text=[f"{v:+.1f} bp" for v in asw_curve.values()],
+                textposition="outside",
+            ))
+            fig_asw.update_layout(**PLOT_LAYOUT, height=200,
+                                  title=dict(text="ASW Curve Spreads", font=dict(size=10, color="#9090a8"), x=0))
+            fig_asw.update_yaxes(tickformat=".1f", ticksuffix=" bp")
+            return fig_asw
+
+        with figure_scope("asw", tuple(asw_curve.values())):
+            fig_asw = memo("fig_asw", build_asw)
         st.plotly_chart(fig_asw, use_container_width=True, config={"displayModeBar": False})
 
-    if uploaded:
+    if asw_df is not None:
         section("ASW HISTORY (Uploaded Data)")
         try:
-            asw_df = pd.read_csv(uploaded, index_col=0, parse_dates=True)
-            fig_asw_hist = line_chart(asw_df, asw_df.columns.tolist(),
-                                       "ASW History — Uploaded CSV",
-                                       colors=[COLORS["accent"], COLORS["accent2"],
-                                               COLORS["IT"], COLORS["ES"]],
-                                       yformat=".1f", height=250)
+            with figure_scope("asw", asw_df.attrs.get("digest")):
+                fig_asw_hist = memo("fig_asw_hist", lambda: line_chart(
+                    asw_df, asw_df.columns.tolist(), "ASW History — Uploaded CSV",
+                    colors=[COLORS["accent"], COLORS["accent2"], COLORS["IT"], COLORS["ES"]],
+                    yformat=".1f", height=250))
             st.plotly_chart(fig_asw_hist, use_container_width=True, config={"displayModeBar": False})
         except Exception as e:
-            st.error(f"CSV parsing error: {e}")
+            st.error(f"ASW chart error: {e}")
+
 
+def render_fx(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 9. FX
     # ════════════════════════════════════════════════════════
+    fx_data = snapshot_slice(data["yahoo"], FX)
+    history = data["history"]
     section("FOREX")
 
-    cols = st.columns(len(FX))
-    for i, (name, ticker) in enumerate(FX.items()):
-        with cols[i]:
-            render_ticker_card(name, fx_data.get(name, {}), decimals=4)
+    live_tile_row([(i["label"], i["symbol"], fx_data.get(i["label"], {}),
+                    dict(decimals=i["decimals"], suffix=i["suffix"])) for i in group_instruments("fx")])
 
     col1, col2 = st.columns(2)
     with col1:
-        df_eurusd = fetch_yf_history("EURUSD=X", period)
+        df_eurusd = slice_period(history.get("EURUSD=X", pd.DataFrame()), period)
         if not df_eurusd.empty:
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df_eurusd.index, y=df_eurusd["Close"],
-                                     line=dict(color=COLORS["accent"], width=1.5), name="EUR/USD"))
-            fig.update_layout(**PLOT_LAYOUT, height=200,
-                              title=dict(text="EUR/USD", font=dict(size=10, color="#9090a8"), x=0))
+            fig = memo("df_eurusd", lambda: price_chart(df_eurusd, "EUR/USD", "EUR/USD", COLORS["accent"]))
             st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
     with col2:
-        df_usdjpy = fetch_yf_history("USDJPY=X", period)
+        df_usdjpy = slice_period(history.get("USDJPY=X", pd.DataFrame()), period)
         if not df_usdjpy.empty:
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(x=df_usdjpy.index, y=df_usdjpy["Close"],
-                                     line=dict(color=COLORS["accent2"], width=1.5), name="USD/JPY"))
-            fig.update_layout(**PLOT_LAYOUT, height=200,
-                              title=dict(text="USD/JPY", font=dict(size=10, color="#9090a8"), x=0))
+            fig = memo("df_usdjpy", lambda: price_chart(df_usdjpy, "USD/JPY", "USD/JPY", COLORS["accent2"]))
             st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
 
+
+def render_commodities(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 10. COMMODITIES
     # ════════════════════════════════════════════════════════
+    commo_data = snapshot_slice(data["yahoo"], COMMODITIES)
     section("COMMODITIES")
 
-    cols = st.columns(len(COMMODITIES))
-    decimals_map = {"WTI Oil": 2, "Brent Oil": 2, "Gold": 1, "Silver": 3, "Nat Gas": 3, "Copper": 4}
-    for i, (name, _) in enumerate(COMMODITIES.items()):
-        with cols[i]:
-            render_ticker_card(name, commo_data.get(name, {}),
-                               decimals=decimals_map.get(name, 2), suffix=" $")
+    render_group("commodities", commo_data)
 
     # Gold vs Silver ratio
     gold = commo_data.get("Gold", {}).get("price")
@@ -952,41 +1573,37 @@ def main():
             <div class="spread-val" style="color: #f7941d">{ratio:.1f}x</div>
         </div>""", unsafe_allow_html=True)
 
+
+def render_crypto(data: dict, period: str):
     # ════════════════════════════════════════════════════════
     # 11. CRYPTO + ETF FLOWS
     # ════════════════════════════════════════════════════════
+    cg_data, etf_flows = data["coingecko"], data["etf"]
+    crypto_yf = snapshot_slice(data["yahoo"], CRYPTO_YF)
+    history = data["history"]
     section("CRYPTO + BTC ETF FLOWS")
 
-    # CoinGecko data
-    cg_map = {
-        "Bitcoin":  ("bitcoin", "BTC"),
-        "Ethereum": ("ethereum", "ETH"),
-        "Solana":   ("solana", "SOL"),
-    }
-    col1, col2, col3 = st.columns(3)
-    for i, (name, (cg_id, sym)) in enumerate(cg_map.items()):
-        with [col1, col2, col3][i]:
-            d = cg_data.get(cg_id, {})
-            price = d.get("usd")
-            pct24h = d.get("usd_24h_change", 0)
-            render_ticker_card(
-                f"{name} ({sym})",
-                {"price": price, "pct": pct24h, "chg": (price * pct24h / 100) if price else 0},
-                decimals=0 if price and price > 100 else 4,
-                suffix=" $"
-            )
-
-    st.markdown("**BTC Spot ETF — Volume (Flow Proxy)**")
-    etf_cols = st.columns(len(BTC_ETFS))
-    for i, (name, data) in enumerate(etf_flows.items()):
-        with etf_cols[i]:
-            vol = data.get("volume")
-            vol_usd = data.get("vol_usd")
-            vol_chg = data.get("vol_chg", 0)
-            price = data.get("price")
+    # CoinGecko data, Yahoo snapshot on a CoinGecko miss
+    quotes = crypto_quotes(cg_data, crypto_yf)
+    live_tile_row([
+        (f"{i['label']} ({i.get('short', i['symbol'])})", i["symbol"], (q := quotes[i["label"]]),
+         dict(decimals=0 if q["price"] and q["price"] > 100 else 4, suffix=i["suffix"]))
+        for i in group_instruments("crypto")
+    ])
+
+    st.markdown("**BTC Spot ETFs — Volume (Flow Proxy)**")
+    etfs = list(etf_flows["etfs"].items())
+    for col, (name, flow) in zip(card_columns(len(etfs)), etfs):
+        with col:
+            vol = flow.get("volume")
+            vol_usd = flow.get("vol_usd")
+            vol_chg = flow.get("vol_chg", 0)
+            price = flow.get("price")
+            net = flow.get("flow")
             price_str = f"${price:.2f}" if price else "N/A"
             vol_str = f"{vol:,.0f}" if vol else "N/A"
             vol_usd_str = f"${vol_usd/1e6:.0f}M" if vol_usd else "N/A"
+            net_str = f"{'+' if net >= 0 else '-'}${abs(net)/1e6:,.1f}M" if net is not None else "N/A"
             sign = "▲" if vol_chg > 0 else "▼"
             cls = "ticker-change-pos" if vol_chg > 0 else "ticker-change-neg"
             st.markdown(f"""
@@ -995,24 +1612,281 @@ def main():
                 <div class="ticker-value">{price_str}</div>
                 <div class="{cls}">{sign} Vol: {vol_str} ({vol_usd_str})</div>
                 <div class="ticker-sub">Vol change vs prev: {vol_chg:+,.0f}</div>
+                <div class="ticker-sub">Flow proxy: {net_str}</div>
             </div>""", unsafe_allow_html=True)
 
+    # Aggregate flow proxy across every issuer: daily bars, running total
+    daily = slice_period(etf_flows["daily"].dropna(), period)
+    def build_flows():
+        cumulative = etf_flows["cumulative"].reindex(daily.index)
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=daily.index, y=daily / 1e6, name="Daily ($M)",
+                             marker_color=np.where(daily >= 0, COLORS["green"], COLORS["red"])))
+        fig.add_trace(scatter(len(cumulative), x=cumulative.index, y=cumulative / 1e9, yaxis="y2",
+                              line=dict(color=COLORS["accent"], width=1.5), name="Cumulative ($B)"))
+        fig.update_layout(
+            **PLOT_LAYOUT,
+            height=240,
+            title=dict(text=f"BTC Spot ETFs — Flow Proxy ({len(etfs)} issuers), cumulative since "
+                            f"{etf_flows['cumulative'].index[0]:%Y-%m-%d}",
+                       font=dict(size=10, color="#9090a8"), x=0),
+            yaxis2=dict(overlaying="y", side="right", showgrid=False, tickformat=".1f",
+                        title=dict(text="Cum ($B)", font=dict(size=8))),
+        )
+        return fig
+
+    if not daily.empty:
+        st.plotly_chart(memo("fig_etf_flows", build_flows), use_container_width=True,
+                        config={"displayModeBar": False})
+
     # BTC price chart
-    df_btc = fetch_yf_history("BTC-USD", period)
-    if not df_btc.empty:
+    df_btc = slice_period(history.get("BTC-USD", pd.DataFrame()), period)
+    def build_btc():
+        close = downsample(df_btc["Close"], point_budget())
+        # Bars can't be thinned by shape — keep each bucket's min and max volume
+        volume = downsample(df_btc["Volume"], point_budget(), method="minmax")
         fig_btc = go.Figure()
-        fig_btc.add_trace(go.Scatter(x=df_btc.index, y=df_btc["Close"],
-                                     line=dict(color=COLORS["accent"], width=1.5), name="BTC/USD"))
-        fig_btc.add_trace(go.Bar(x=df_btc.index, y=df_btc["Volume"] / 1e9,
+        fig_btc.add_trace(scatter(len(close), x=close.index, y=close,
+                                  line=dict(color=COLORS["accent"], width=1.5), name="BTC/USD"))
+        fig_btc.add_trace(go.Bar(x=volume.index, y=volume / 1e9,
                                   marker_color="#2a2a3a", name="Volume (B)", yaxis="y2", opacity=0.5))
         fig_btc.update_layout(
             **PLOT_LAYOUT,
             height=240,
             title=dict(text="Bitcoin (BTC/USD) — Price + Volume", font=dict(size=10, color="#9090a8"), x=0),
             yaxis2=dict(overlaying="y", side="right", showgrid=False, tickformat=".1f",
-                        title="Vol (B)", titlefont=dict(size=8)),
+                        title=dict(text="Vol (B)", font=dict(size=8))),
         )
-        st.plotly_chart(fig_btc, use_container_width=True, config={"displayModeBar": False})
+        return fig_btc
+
+    if not df_btc.empty:
+        st.plotly_chart(memo("fig_btc", build_btc), use_container_width=True, config={"displayModeBar": False})
+
+
+def render_cross_asset(data: dict, period: str):
+    # ════════════════════════════════════════════════════════
+    # 12. CROSS-ASSET RISK
+    # ════════════════════════════════════════════════════════
+    stats = data["cross_asset"]
+    section("CROSS-ASSET RISK — Rolling Vol · Beta · Correlation")
+    if not stats:
+        st.caption("No cross-asset history yet")
+        return
+    st.caption(f"{stats['window']}-day window of daily log returns to {stats['as_of']:%Y-%m-%d} · "
+               f"vol annualized · beta vs {BETA_BENCHMARK}")
+
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        fig = memo("corr_heatmap", lambda: corr_heatmap(stats["corr"], "Correlation matrix"))
+        st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+    with col2:
+        table = pd.DataFrame({"Vol %": stats["vol"].round(1), "Beta": stats["beta"].round(2)})
+        st.dataframe(table, height=560, use_container_width=True)
+
+
+# Universe groups with a section of their own; any other group in the file goes under WATCHLIST
+SECTION_GROUPS = ("equities", "eurex", "fx", "commodities", "crypto", "btc_etfs")
+WATCHLIST_GROUPS = [g for g in UNIVERSE["groups"] if g not in SECTION_GROUPS]
+
+
+def render_watchlist(data: dict, period: str):
+    # ════════════════════════════════════════════════════════
+    # 13. WATCHLIST — universe groups outside the fixed layout
+    # ════════════════════════════════════════════════════════
+    for group in WATCHLIST_GROUPS:
+        section(f"WATCHLIST · {(UNIVERSE['groups'][group]['title'] or group).upper()}")
+        render_group(group, snapshot_slice(data["yahoo"], group_tickers(group)))
+
+
+# Page order: (section, sources it needs, renderer). With auto-refresh on, a section ticks
+# at the fastest of its sources' REFRESH_SCHEDULE, so no source's update waits on a slower one.
+SECTIONS = [
+    ("equities",      ("yahoo",),              render_equities),
+    ("eurex",         ("yahoo", "history"),    render_eurex),
+    ("sovereign",     ("ecb", "fred"),         render_sovereign),
+    ("curves",        ("ecb", "fred"),         render_curves),
+    ("curve_spreads", ("ecb", "fred"),         render_curve_spreads),
+    ("boxes",         ("ecb",),                render_boxes),
+    ("rates_exp",     None,                    None),
+    ("asw",           None,                    None),
+    ("fx",            ("yahoo", "history"),    render_fx),
+    ("commodities",   ("yahoo",),              render_commodities),
+    ("crypto",        ("coingecko", "etf", "yahoo", "history"), render_crypto),
+    ("cross_asset",   ("cross_asset",),        render_cross_asset),
+    *([("watchlist",  ("yahoo",),              render_watchlist)] if WATCHLIST_GROUPS else []),
+]
+STATUS_REFRESH = 10
+
+
+# Sources an intraday-mode section reads from the intraday bars instead
+INTRADAY_VIEWS = {"yahoo": "intraday", "history": "intraday"}
+
+
+def section_sources(needs: tuple, bars: str) -> tuple:
+    """The board entries a section reads for the chosen bars."""
+    return needs if bars == "1d" else tuple(dict.fromkeys(INTRADAY_VIEWS.get(n, n) for n in needs))
+
+
+def section_fragment(name: str, needs: tuple, render, period: str,
+                     overrides: dict, run_every: int | None, bars: str = "1d"):
+    """
+    Render one section as an independent refresh unit (st.fragment).
+    On each timer tick it re-reads its sources from the snapshot board;
+    figures are rebuilt only when the sources' published version changes.
+    With intraday bars, the snapshot and history sources come from the
+    intraday entry instead.
+    """
+    sources = section_sources(needs, bars)
+
+    @st.fragment(run_every=run_every)
+    def refresh_unit():
+        for n in sources:
+            refresher().request(n)   # no-op but for on-demand jobs
+        board = refresher().board
+        entries = {n: board.get(n) for n in sources}
+        data = {n: (e["data"] if e else SOURCE_DEFAULTS[n]) for n, e in entries.items()}
+        if "intraday" in data:
+            intraday = data.pop("intraday")
+            data.update(yahoo=intraday["snapshot"], history=intraday["bars"].get(bars, {}))
+        for n in needs:
+            if n in overrides:
+                data[n] = overrides[n]()
+        version = (period, bars) + tuple(e["version"] if e else 0 for e in entries.values())
+        with figure_scope(name, version, shared=not any(n in overrides for n in needs)):
+            render(data, period)
+        render_degraded_badge(entries)
+
+    refresh_unit()
+
+
+def status_fragment(run_every: int | None):
+    @st.fragment(run_every=run_every)
+    def refresh_unit():
+        board = refresher().board
+        entries = {n: e for n in REFRESH_JOBS if (e := board.get(n)) is not None}
+        render_source_status(entries)
+
+    refresh_unit()
+
+
+# ─────────────────────────────────────────────────────────────
+# MAIN APP
+# ─────────────────────────────────────────────────────────────
+
+def main():
+
+    # ── Top bar (the auto-refresh toggle's state is known before its widget runs) ──
+    now = datetime.utcnow().strftime("%Y-%m-%d  %H:%M:%S UTC")
+    intervals = [min(REFRESH_SCHEDULE[n] for n in needs) for _, needs, _ in SECTIONS if needs]
+    refresh_note = (f"Auto-refresh per section every {min(intervals)}–{max(intervals)}s"
+                    if st.session_state.get("auto_refresh") else "Auto-refresh off")
+    st.markdown(f"""
+    <div class="top-bar">
+        <span class="top-bar-title">◈ MACRO TERMINAL · GLOBAL MARKETS</span>
+        <span class="top-bar-time">🕐 {now} · {refresh_note}</span>
+    </div>
+    """, unsafe_allow_html=True)
+    # hit=True on warm reruns, so the cold-start cost stays separable in diagnostics
+    metrics().record("startup", "import", _IMPORT_MS, hit=not _COLD_START)
+    metrics().record("startup", "first_paint", (time.perf_counter() - _RUN_START) * 1000,
+                     hit=not _COLD_START)
+    status_slot = st.empty()
+    if METRICS_PORT:
+        metrics_server(METRICS_PORT)
+
+    # ── Sidebar config ──
+    with st.sidebar:
+        st.markdown("### ⚙ Settings")
+        fred_key = st.text_input("FRED API Key (optional)", type="password",
+                                 help="Get free key at fred.stlouisfed.org/docs/api")
+        auto_refresh = st.checkbox("Auto-refresh (per section)", value=False, key="auto_refresh")
+        period = st.selectbox("Chart lookback", ["1mo", "3mo", "6mo", "1y", "2y"], index=2)
+        bars = st.radio("Bars", ["1d", *INTRADAY_BARS], horizontal=True,
+                        help="Intraday: tiles show change vs prior close and vs session open; "
+                             "charts show the last few sessions")
+        st.markdown("---")
+        st.markdown("### 📋 ASW Manual Input")
+        st.markdown("*Enter values from Bloomberg/SEB (bps)*")
+        asw_du  = st.number_input("DU ASW (2Y Schatz)", value=0.0, step=0.1, format="%.1f")
+        asw_oe  = st.number_input("OE ASW (5Y Bobl)",   value=0.0, step=0.1, format="%.1f")
+        asw_rx  = st.number_input("RX ASW (10Y Bund)",  value=0.0, step=0.1, format="%.1f")
+        asw_ub  = st.number_input("UB ASW (30Y Buxl)",  value=0.0, step=0.1, format="%.1f")
+        st.markdown("---")
+        st.markdown("### 📂 ASW Bulk Upload")
+        uploaded = st.file_uploader("Upload ASW CSV (BBG/SEB export)", type=["csv"])
+        asw_df = None
+        if uploaded:
+            try:
+                asw_df = uploaded_asw(uploaded)
+                st.dataframe(asw_df.tail(10), height=150)
+            except Exception as e:
+                st.error(f"CSV parsing error: {e}")
+        st.markdown("---")
+        with st.expander("🔌 HTTP connections"):
+            pool_stats = http_pool_stats()
+            if pool_stats:
+                st.dataframe(pd.DataFrame(pool_stats).T, height=150)
+            else:
+                st.caption("No upstream calls yet")
+        if st.checkbox("Show diagnostics", value=False):
+            summary = metrics().summary()
+            if summary.empty:
+                st.caption("No instrumented calls yet")
+            else:
+                st.dataframe(summary, height=300)
+            health = upstream_health()
+            if not health.empty:
+                st.dataframe(health)
+            if (stream := quote_stream()) is not None:
+                s = stream.status()
+                st.caption(f"Quote stream: {s['state']} · {s['ticks']:,} ticks"
+                           + (f" · {s['error']}" if s["error"] else ""))
+            st.download_button("Prometheus metrics", metrics().prometheus(),
+                               file_name="macro_metrics.prom", mime="text/plain")
+
+    asw_values = {
+        "DU ASW (2Y)": asw_du,
+        "OE ASW (5Y)": asw_oe,
+        "RX ASW (10Y)": asw_rx,
+        "UB ASW (30Y)": asw_ub,
+    }
+
+    # ── Lay out every section slot up front, in page order ──
+    slots = {name: st.container() for name, *_ in SECTIONS}
+    with slots["rates_exp"]:
+        render_rate_expectations()
+    with slots["asw"]:
+        render_asw(asw_values, asw_df)
+
+    # ── Each section is its own fragment reading the shared snapshot ──
+    # A cold server waits here for first publishes; afterwards every source is on the board.
+    board = refresher().board
+    overrides = {}
+    if fred_key and fred_key != os.environ.get("FRED_API_KEY", ""):
+        # A session-specific FRED key can't be served from the shared snapshot
+        overrides["fred"] = lambda: fetch_fred_yields(fred_key)
+    ready = set()
+    pending = [item for item in SECTIONS if item[2] is not None]
+    if bars != "1d":
+        refresher().request("intraday")
+
+    def render_ready():
+        for item in [p for p in pending if all(n in ready for n in section_sources(p[1], bars))]:
+            name, needs, render = item
+            interval = min(REFRESH_SCHEDULE[n] for n in needs)
+            with slots[name]:
+                section_fragment(name, needs, render, period, overrides,
+                                 interval if auto_refresh else None, bars)
+            pending.remove(item)
+
+    with st.spinner("Fetching market data..."):
+        for source, _ in board.wait_for(refresher().active(), timeout=max(SOURCE_DEADLINES.values())):
+            ready.add(source)
+            render_ready()
+    ready.update(REFRESH_JOBS)
+    render_ready()
+    with status_slot:
+        status_fragment(STATUS_REFRESH if auto_refresh else None)
 
     # ════════════════════════════════════════════════════════
     # FOOTER
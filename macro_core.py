@@ -0,0 +1,2314 @@
+"""
+Macro dashboard core — data, storage and analytics, without any UI.
+
+Fetchers, the local time-series store, the yield cube / Nelson-Siegel
+analytics and the spread/box math live here, importable without Streamlit
+or Plotly. dashboard.py puts these behind the Streamlit cache; batch jobs
+use them directly:
+
+    python macro_core.py snapshot -o snapshot.json      # or .parquet
+    python macro_core.py snapshot --bars 1m             # tiles off intraday bars
+
+writes a full market snapshot (tiles, yields, spreads, boxes, ETF flows),
+and exits 1 when any source is not ok unless --allow-degraded is given.
+The instruments come from universe.json (or the file in MACRO_UNIVERSE).
+"""
+
+from __future__ import annotations
+
+import argparse
+from abc import ABC, abstractmethod
+import base64
+import contextlib
+import contextvars
+import functools
+import hashlib
+import io
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+
+def singleton(build):
+    """Build on first call, then return the same instance process-wide (thread-safe)."""
+    lock, box = threading.Lock(), []
+
+    @functools.wraps(build)
+    def get():
+        if not box:
+            with lock:
+                if not box:
+                    box.append(build())
+        return box[0]
+
+    get.clear = box.clear
+    return get
+
+
+# ─────────────────────────────────────────────────────────────
+# CONSTANTS & TICKERS
+# ─────────────────────────────────────────────────────────────
+
+# The instrument universe lives in a JSON file (MACRO_UNIVERSE, universe.json
+# beside this module by default) — adding an instrument or a group needs no code change
+UNIVERSE_PATH = Path(os.environ.get("MACRO_UNIVERSE", Path(__file__).with_name("universe.json")))
+GROUP_DEFAULTS = {"title": "", "decimals": 2, "suffix": "", "snapshot": True, "stream": False, "risk": False}
+
+
+def load_universe(path: Path = UNIVERSE_PATH) -> dict:
+    """
+    Read the universe file: {"groups": {group: {...}}, "ecb_countries": {code: name}}.
+    Each group has a title, flags (snapshot: in the Yahoo snapshot, stream: on
+    the live quote feed, risk: in the cross-asset engine) and instruments
+    [{"label", "symbol", "row", "decimals", "suffix", ...}]; an instrument's
+    missing display fields fall back to its group's.
+    Raises ValueError naming the file and group on a malformed entry.
+    """
+    raw = json.loads(Path(path).read_text(encoding="utf-8"))
+    groups = {}
+    for name, spec in raw.get("groups", {}).items():
+        group = {**GROUP_DEFAULTS, **{k: v for k, v in spec.items() if k != "instruments"}}
+        instruments, labels = [], set()
+        for item in spec.get("instruments", []):
+            if not item.get("label") or not item.get("symbol"):
+                raise ValueError(f"{path}: {name}: every instrument needs a label and a symbol ({item})")
+            if item["label"] in labels:
+                raise ValueError(f"{path}: {name}: duplicate label {item['label']!r}")
+            labels.add(item["label"])
+            instruments.append({"row": "", "decimals": group["decimals"], "suffix": group["suffix"], **item})
+        groups[name] = {**group, "instruments": instruments}
+    return {"groups": groups, "ecb_countries": raw.get("ecb_countries", {})}
+
+
+UNIVERSE = load_universe()
+
+
+def group_instruments(group: str) -> list:
+    """Instruments of a universe group, in file order (empty if the group isn't defined)."""
+    spec = UNIVERSE["groups"].get(group)
+    return spec["instruments"] if spec else []
+
+
+def group_tickers(group: str) -> dict:
+    """{label: symbol} of a universe group."""
+    return {i["label"]: i["symbol"] for i in group_instruments(group)}
+
+
+def group_rows(group: str) -> dict:
+    """{row title: [instrument]} of a universe group, rows in order of first appearance."""
+    rows = {}
+    for item in group_instruments(group):
+        rows.setdefault(item["row"], []).append(item)
+    return rows
+
+
+def flagged_groups(flag: str) -> list:
+    """Names of the universe groups with a flag (snapshot/stream/risk) set."""
+    return [name for name, spec in UNIVERSE["groups"].items() if spec[flag]]
+
+
+EQUITIES = group_tickers("equities")
+EUREX_FUTURES = group_tickers("eurex")
+FX = group_tickers("fx")
+COMMODITIES = group_tickers("commodities")
+CRYPTO_YF = group_tickers("crypto")
+# US spot Bitcoin ETFs (every issuer) for the flow proxy
+BTC_ETFS = group_tickers("btc_etfs")
+
+# FRED series for US yield curve
+FRED_SERIES = {
+    "2Y":  "DGS2",
+    "5Y":  "DGS5",
+    "10Y": "DGS10",
+    "30Y": "DGS30",
+}
+
+# ECB SDW series IDs for sovereign yields
+# Format: IRS.M.{country}.L.L45.YC.EUR.{tenor}.?YF.M.A
+ECB_COUNTRIES = UNIVERSE["ecb_countries"]
+ECB_TENORS = {"2Y": "2", "5Y": "5", "10Y": "10", "30Y": "30"}
+
+TENORS = ["2Y", "5Y", "10Y", "30Y"]
+SPREADS_DEF = [("2s5s", "2Y", "5Y"), ("5s10s", "5Y", "10Y"), ("2s10s", "2Y", "10Y"), ("10s30s", "10Y", "30Y")]
+
+# Sovereign spreads vs Bund and box pairs: (label, c1, c2)
+SOVEREIGN_SPREADS = [("OAT-Bund", "FR", "DE"), ("BTP-Bund", "IT", "DE"), ("BONOS-Bund", "ES", "DE")]
+BOX_PAIRS = [("FR-DE", "FR", "DE"), ("IT-DE", "IT", "DE"), ("ES-DE", "ES", "DE")]
+
+# CoinGecko ids and symbols of the CRYPTO_YF coins
+COINGECKO_IDS = {i["label"]: (i["coingecko"], i.get("short", i["label"]))
+                 for i in group_instruments("crypto") if "coingecko" in i}
+
+
+# ─────────────────────────────────────────────────────────────
+# INSTRUMENTATION
+# ─────────────────────────────────────────────────────────────
+
+METRICS_WINDOW = 5000   # most recent calls kept for latency quantiles
+METRICS_LOG = os.environ.get("MACRO_METRICS_LOG", "")          # JSONL file, one line per call
+METRICS_PORT = int(os.environ.get("MACRO_METRICS_PORT", 0))    # Prometheus /metrics endpoint
+
+
+class Metrics:
+    """
+    Rolling window of instrumented calls (fetchers, figure builds), plus
+    cumulative per-(kind, name) counters for the Prometheus export.
+    """
+
+    def __init__(self, window: int, log_path: str = ""):
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=window)
+        self._totals = {}
+        self._log = open(log_path, "a", buffering=1) if log_path else None
+
+    def record(self, kind: str, name: str, ms: float, hit: bool, status=None,
+               nbytes: int = 0, rows: int = 0, error: str = None, age: float = None):
+        event = {"ts": time.time(), "kind": kind, "name": name, "ms": round(ms, 3), "hit": hit,
+                 "status": status, "bytes": nbytes, "rows": rows, "error": error,
+                 "age": None if age is None else round(age, 1)}
+        with self._lock:
+            self._events.append(event)
+            t = self._totals.setdefault((kind, name), {"calls": 0, "hits": 0, "errors": 0, "bytes": 0})
+            t["calls"] += 1
+            t["hits"] += hit
+            t["errors"] += error is not None
+            t["bytes"] += nbytes
+            if self._log:
+                self._log.write(json.dumps(event) + "\n")
+
+    def summary(self) -> pd.DataFrame:
+        """Per (kind, name) over the window: calls, hit rate, p50/p95 ms, last status, bytes, rows, data age."""
+        with self._lock:
+            events = pd.DataFrame(list(self._events))
+        if events.empty:
+            return events
+        g = events.groupby(["kind", "name"])
+        return pd.DataFrame({
+            "calls": g.size(),
+            "hit %": g["hit"].mean() * 100,
+            "p50 ms": g["ms"].median(),
+            "p95 ms": g["ms"].quantile(0.95),
+            "last status": g["status"].last(),
+            "errors": g["error"].count(),
+            "bytes": g["bytes"].sum(),
+            "rows": g["rows"].last(),
+            "age s": g["age"].last(),
+        }).round(1)
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition: window quantiles plus cumulative counters."""
+        with self._lock:
+            events = list(self._events)
+            totals = {k: dict(v) for k, v in self._totals.items()}
+        lines = ["# TYPE macro_call_duration_ms summary"]
+        by_key = {}
+        for e in events:
+            by_key.setdefault((e["kind"], e["name"]), []).append(e)
+        for (kind, name), evs in sorted(by_key.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            ms = np.array([e["ms"] for e in evs])
+            for q in (0.5, 0.95):
+                lines.append(f'macro_call_duration_ms{{{labels},quantile="{q}"}} {np.quantile(ms, q):.3f}')
+            lines.append(f"macro_call_duration_ms_count{{{labels}}} {len(ms)}")
+            status = next((e["status"] for e in reversed(evs) if e["status"] is not None), None)
+            if status is not None:
+                lines.append(f"macro_last_http_status{{{labels}}} {status}")
+            lines.append(f"macro_rows{{{labels}}} {evs[-1]['rows']}")
+            if evs[-1]["age"] is not None:
+                lines.append(f"macro_data_age_seconds{{{labels}}} {evs[-1]['age']}")
+        for metric, field in (("macro_calls_total", "calls"), ("macro_cache_hits_total", "hits"),
+                              ("macro_errors_total", "errors"), ("macro_bytes_received_total", "bytes")):
+            lines.append(f"# TYPE {metric} counter")
+            for (kind, name), t in sorted(totals.items()):
+                lines.append(f'{metric}{{kind="{kind}",name="{name}"}} {t[field]}')
+        return "\n".join(lines) + "\n"
+
+
+@singleton
+def metrics() -> Metrics:
+    """Process-wide metrics, shared by every session and the refresher threads."""
+    return Metrics(METRICS_WINDOW, METRICS_LOG)
+
+
+def start_metrics_server(port: int) -> ThreadingHTTPServer:
+    """Serve metrics().prometheus() on http://0.0.0.0:<port>/metrics from a daemon thread."""
+    m = metrics()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = m.prometheus().encode()
+            self.send_response(200 if self.path.rstrip("/") in ("", "/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+# Counters of the instrumented call running in this context; http_get adds to them
+_call_stats = contextvars.ContextVar("call_stats", default=None)
+
+
+def _row_count(obj) -> int:
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(_row_count(v) if isinstance(v, (dict, pd.DataFrame, pd.Series)) else 1
+                   for v in obj.values())
+    return 0
+
+
+# ─────────────────────────────────────────────────────────────
+# UPSTREAM HEALTH (circuit breakers, adaptive timeouts)
+# ─────────────────────────────────────────────────────────────
+
+BREAKER_FAILURES = 3      # consecutive failures that open an upstream's breaker
+BREAKER_COOLDOWN = 30     # seconds open before a single half-open probe
+HTTP_TIMEOUT = 8          # timeout ceiling, and the value until latencies are known (s)
+HTTP_MIN_TIMEOUT = 3      # floor, so a slow first page of a backfill still fits
+TIMEOUT_P95_FACTOR = 4    # adaptive timeout = factor × p95 of recent good calls
+LATENCY_SAMPLES = 50
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Per-upstream breaker. Closed until BREAKER_FAILURES consecutive failures,
+    then open: calls are refused for BREAKER_COOLDOWN seconds. Then half-open:
+    one probe goes through and closes it on success or re-opens it on failure.
+    Latencies of good calls size the upstream's adaptive timeout.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    @property
+    def degraded(self) -> bool:
+        return self.state != "closed" or self.failures > 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= BREAKER_COOLDOWN:
+                self.state, self._probing = "half_open", False
+            if self.state == "half_open":
+                if self._probing:
+                    return False
+                self._probing = True
+            return self.state != "open"
+
+    def success(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.state, self.failures, self._probing = "closed", 0, False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= BREAKER_FAILURES:
+                self.state, self._opened_at = "open", time.monotonic()
+            self._probing = False
+
+    def timeout(self) -> float:
+        with self._lock:
+            if len(self._latencies) < 5:
+                return HTTP_TIMEOUT
+            p95 = float(np.percentile(self._latencies, 95))
+        return min(HTTP_TIMEOUT, max(HTTP_MIN_TIMEOUT, TIMEOUT_P95_FACTOR * p95))
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "timeout s": round(self.timeout(), 2)}
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(upstream: str) -> CircuitBreaker:
+    """The process-wide breaker of one upstream (an HTTP host, or "yahoo")."""
+    with _breakers_lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker(upstream)
+        return _breakers[upstream]
+
+
+def upstream_health() -> pd.DataFrame:
+    """Breaker state, consecutive failures and current timeout per upstream seen so far."""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return pd.DataFrame({name: b.snapshot() for name, b in sorted(breakers.items())}).T
+
+
+@contextlib.contextmanager
+def guarded(upstream: str):
+    """
+    Run the block as one call to upstream: CircuitOpen if its breaker is
+    open, the outcome recorded either way (an exception is a failure).
+    Yields the adaptive timeout to use.
+    """
+    guard = breaker(upstream)
+    if not guard.allow():
+        raise CircuitOpen(upstream)
+    started = time.monotonic()
+    try:
+        yield guard.timeout()
+    except BaseException:
+        guard.failure()
+        raise
+    guard.success(time.monotonic() - started)
+
+
+# ─────────────────────────────────────────────────────────────
+# HTTP SESSION
+# ─────────────────────────────────────────────────────────────
+
+HTTP_POOL_HOSTS = 10      # distinct host pools kept alive
+HTTP_POOL_SIZE = 8        # max open connections per host
+HTTP_RETRIES = 3          # retries on 429/5xx answers
+HTTP_CONNECT_RETRIES = 1  # retries on a failed connect; read timeouts are never retried
+
+
+@singleton
+def http_session() -> requests.Session:
+    """
+    Process-wide pooled session shared by every HTTP fetcher.
+    Keep-alive connections, bounded pool per host, gzip, and jittered
+    exponential backoff on 429/5xx (honouring Retry-After). A read timeout
+    is not retried, so the adaptive timeout bounds a call to a dead host.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry_kwargs = dict(
+        total=HTTP_RETRIES,
+        connect=HTTP_CONNECT_RETRIES,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        retry = Retry(backoff_jitter=0.5, **retry_kwargs)
+    except TypeError:
+        # urllib3 < 2 has no backoff_jitter
+        retry = Retry(**retry_kwargs)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_SIZE,
+                          pool_block=True, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    """
+    GET through the shared session, behind the host's circuit breaker
+    (CircuitOpen while it is open). 5xx/429 answers count as failures.
+    The timeout adapts to the host's recent latency unless one is given.
+    """
+    guard = breaker(urlsplit(url).hostname)
+    if not guard.allow():
+        raise CircuitOpen(guard.name)
+    kwargs.setdefault("timeout", guard.timeout())
+    started = time.monotonic()
+    try:
+        r = http_session().get(url, **kwargs)
+    except BaseException:
+        guard.failure()
+        raise
+    if r.status_code >= 500 or r.status_code == 429:
+        guard.failure()
+    else:
+        guard.success(time.monotonic() - started)
+    stats = _call_stats.get()
+    if stats is not None:
+        stats["status"] = r.status_code
+        stats["bytes"] += len(r.content)
+    return r
+
+
+def http_pool_stats() -> dict:
+    """
+    Connection-reuse counters per host from the urllib3 pools.
+    Returns {host: {"requests": n, "connections": n, "reused": n}}
+    """
+    stats = {}
+    for adapter in {id(a): a for a in http_session().adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            s = stats.setdefault(pool.host, {"requests": 0, "connections": 0, "reused": 0})
+            s["requests"] += pool.num_requests
+            s["connections"] += pool.num_connections
+            s["reused"] = s["requests"] - s["connections"]
+    return stats
+
+
+# ─────────────────────────────────────────────────────────────
+# LOCAL TIME-SERIES STORE
+# ─────────────────────────────────────────────────────────────
+
+STORE_PATH = Path(os.environ.get("MACRO_STORE_PATH",
+                                 Path(__file__).resolve().parent / ".macro_store" / "timeseries.sqlite"))
+BAR_FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+class TimeSeriesStore:
+    """
+    On-disk SQLite store for daily bars and yield observations.
+    Rows are keyed by (symbol, date) / (series, date) and upserted, so
+    re-fetching the last stored day simply overwrites a partial bar.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT, date TEXT,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS yields (
+                    series TEXT, date TEXT, value REAL,
+                    PRIMARY KEY (series, date)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS backfills (
+                    series TEXT PRIMARY KEY, at TEXT
+                ) WITHOUT ROWID;
+            """)
+
+    def last_dates(self, table: str, keys: list) -> dict:
+        """{key: last stored date} for the keys that have any rows."""
+        col = "symbol" if table == "bars" else "series"
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {col}, MAX(date) FROM {table} WHERE {col} IN ({marks}) GROUP BY {col}",
+                list(keys)).fetchall()
+        return {key: pd.Timestamp(date) for key, date in rows}
+
+    def backfilled(self, series: list) -> set:
+        """Series whose backfill upstream has answered, whether or not it had data for them."""
+        marks = ",".join("?" * len(series))
+        with self._lock:
+            rows = self._conn.execute(f"SELECT series FROM backfills WHERE series IN ({marks})",
+                                      list(series)).fetchall()
+        return {key for key, in rows}
+
+    def mark_backfilled(self, series: list):
+        at = datetime.utcnow().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO backfills VALUES (?,?)", [(k, at) for k in series])
+
+    def upsert_bars(self, symbol: str, df: pd.DataFrame):
+        frame = df.reindex(columns=BAR_FIELDS).dropna(subset=["Close"])
+        dates = pd.DatetimeIndex(frame.index).strftime("%Y-%m-%d")
+        rows = [(symbol, d, *(None if pd.isna(v) else float(v) for v in vals))
+                for d, vals in zip(dates, frame.itertuples(index=False))]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO bars VALUES (?,?,?,?,?,?,?)", rows)
+
+    def read_bars(self, symbols: list, start: pd.Timestamp = None) -> dict:
+        """{symbol: OHLCV DataFrame indexed by date}"""
+        marks = ",".join("?" * len(symbols))
+        query = f"SELECT * FROM bars WHERE symbol IN ({marks})"
+        params = list(symbols)
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(start.strftime("%Y-%m-%d"))
+        with self._lock:
+            df = pd.read_sql_query(query + " ORDER BY date", self._conn, params=params,
+                                   parse_dates=["date"])
+        df.columns = ["symbol", "date"] + BAR_FIELDS
+        return {sym: g.set_index("date")[BAR_FIELDS] for sym, g in df.groupby("symbol")}
+
+    def upsert_yields(self, series: str, points: dict):
+        """points: {date-like: value}"""
+        rows = [(series, pd.Timestamp(d).strftime("%Y-%m-%d"), float(v))
+                for d, v in points.items() if v is not None]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO yields VALUES (?,?,?)", rows)
+
+    def latest_yields(self, series: list) -> dict:
+        """{series: most recent stored value}"""
+        marks = ",".join("?" * len(series))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT y.series, y.value FROM yields y JOIN ("
+                f"  SELECT series, MAX(date) AS date FROM yields"
+                f"  WHERE series IN ({marks}) GROUP BY series"
+                f") m ON y.series = m.series AND y.date = m.date", list(series)).fetchall()
+        return dict(rows)
+
+    def read_yields(self, series: list, start: pd.Timestamp = None) -> pd.DataFrame:
+        """Yield history as a date × series frame."""
+        marks = ",".join("?" * len(series))
+        query = f"SELECT series, date, value FROM yields WHERE series IN ({marks})"
+        params = list(series)
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(start.strftime("%Y-%m-%d"))
+        with self._lock:
+            df = pd.read_sql_query(query, self._conn, params=params, parse_dates=["date"])
+        return df.pivot(index="date", columns="series", values="value").sort_index()
+
+
+@singleton
+def timeseries_store() -> TimeSeriesStore:
+    """Process-wide handle on the local time-series store."""
+    return TimeSeriesStore(STORE_PATH)
+
+
+# ─────────────────────────────────────────────────────────────
+# REQUEST COALESCING
+# ─────────────────────────────────────────────────────────────
+
+class SingleFlight:
+    """
+    At most one in-flight call per key: callers arriving while it runs wait
+    for it and share its result (or exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def busy(self, key) -> bool:
+        return key in self._calls
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+        try:
+            call.set_result(fn())
+        except BaseException as e:
+            call.set_exception(e)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return call.result()
+
+
+# ─────────────────────────────────────────────────────────────
+# SHARED CACHE (across replicas)
+# ─────────────────────────────────────────────────────────────
+
+# sqlite:///<path> (replicas on one host), redis://host:port/db, or none
+CACHE_URL = os.environ.get("MACRO_CACHE_URL", f"sqlite:///{STORE_PATH.parent / 'cache.sqlite'}")
+CACHE_LEASE = 30          # seconds a replica may hold a fill before another one takes over
+CACHE_POLL = 0.1          # seconds between checks while another replica fills
+CACHE_VERSION = 3         # bump whenever the shape of cached values changes (rolling deploys)
+
+_MISSING = object()
+
+
+def dump_value(value) -> bytes:
+    """
+    Serialize a fetch result as data only — never pickle, since the shared
+    cache is writable by anyone on its network: an .npz of plain arrays plus
+    a JSON tree of dicts, lists, scalars, timestamps, Series and DataFrames.
+    Anything else raises TypeError (the entry then just isn't shared).
+    """
+    arrays = {}
+
+    def put(arr) -> str:
+        arr = np.asarray(arr)
+        if arr.dtype == object:
+            if not all(isinstance(x, str) for x in arr.ravel()):
+                raise TypeError("object array that isn't all strings")
+            arr = arr.astype(str)
+        name = f"a{len(arrays)}"
+        arrays[name] = arr
+        return name
+
+    def index(ix: pd.Index) -> dict:
+        if isinstance(ix, pd.DatetimeIndex):
+            return {"dates": put(ix.tz_convert(None) if ix.tz else ix),
+                    "tz": str(ix.tz) if ix.tz else None, "name": enc(ix.name)}
+        return {"values": put(ix.to_numpy()), "name": enc(ix.name)}
+
+    def enc(obj):
+        if obj is None or isinstance(obj, (bool, int, float, str)):
+            return obj
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, (pd.Timestamp, datetime)):
+            return {"ts": pd.Timestamp(obj).isoformat()}
+        if isinstance(obj, list):
+            return [enc(x) for x in obj]
+        if isinstance(obj, tuple):
+            return {"tuple": [enc(x) for x in obj]}
+        if isinstance(obj, dict):
+            return {"dict": [[enc(k), enc(v)] for k, v in obj.items()]}
+        if isinstance(obj, pd.Series):
+            return {"series": put(obj.to_numpy()), "index": index(obj.index), "name": enc(obj.name)}
+        if isinstance(obj, pd.DataFrame):
+            return {"frame": [put(obj.iloc[:, i].to_numpy()) for i in range(obj.shape[1])],
+                    "columns": [enc(c) for c in obj.columns], "index": index(obj.index)}
+        if isinstance(obj, np.ndarray):
+            return {"array": put(obj)}
+        raise TypeError(f"can't share a {type(obj).__name__}")
+
+    tree = json.dumps(enc(value)).encode()
+    buf = io.BytesIO()
+    np.savez(buf, __tree__=np.frombuffer(tree, dtype=np.uint8), **arrays)
+    return buf.getvalue()
+
+
+def load_value(blob: bytes):
+    """Inverse of dump_value; the archive is read with allow_pickle=False."""
+    with np.load(io.BytesIO(blob), allow_pickle=False) as z:
+        arrays = {name: z[name] for name in z.files}
+
+    def index(spec: dict) -> pd.Index:
+        if "dates" in spec:
+            ix = pd.DatetimeIndex(arrays[spec["dates"]], name=dec(spec["name"]))
+            return ix.tz_localize("UTC").tz_convert(spec["tz"]) if spec["tz"] else ix
+        return pd.Index(arrays[spec["values"]], name=dec(spec["name"]))
+
+    def dec(node):
+        if isinstance(node, list):
+            return [dec(x) for x in node]
+        if not isinstance(node, dict):
+            return node
+        if "ts" in node:
+            return pd.Timestamp(node["ts"])
+        if "tuple" in node:
+            return tuple(dec(x) for x in node["tuple"])
+        if "dict" in node:
+            return {dec(k): dec(v) for k, v in node["dict"]}
+        if "series" in node:
+            return pd.Series(arrays[node["series"]], index=index(node["index"]), name=dec(node["name"]))
+        if "frame" in node:
+            columns = [dec(c) for c in node["columns"]]
+            frame = pd.DataFrame({i: arrays[a] for i, a in enumerate(node["frame"])}, index=index(node["index"]))
+            frame.columns = columns
+            return frame
+        if "array" in node:
+            return arrays[node["array"]]
+        raise ValueError(f"unknown node {sorted(node)}")
+
+    return dec(json.loads(arrays.pop("__tree__").tobytes()))
+
+
+class CacheBackend(ABC):
+    """
+    Cross-process cache of fetch results (dump_value, data only) with
+    absolute expiry. A fill lease (claim/release) lets one replica fetch a
+    missing entry while the others wait for its result instead of going
+    upstream too. Backend failures degrade to an uncached fetch, never to
+    an error.
+    """
+
+    @abstractmethod
+    def get(self, key: str):
+        """The stored value, or _MISSING."""
+
+    @abstractmethod
+    def set(self, key: str, value, expires_at: float):
+        """Store value until expires_at (epoch seconds)."""
+
+    @abstractmethod
+    def claim(self, key: str, lease: float) -> bool:
+        """Take the fill lease for key for lease seconds; False if another holder has it."""
+
+    @abstractmethod
+    def release(self, key: str):
+        """Give the fill lease back."""
+
+    def _try(self, op, default, *args):
+        try:
+            return op(*args)
+        except Exception:
+            return default
+
+    def fetch_through(self, key: str, expires_at: float, fill) -> tuple:
+        """(value, hit): the shared entry, or fill()'s result once this replica holds the lease."""
+        value = self._try(self.get, _MISSING, key)
+        # An expired lease is claimable, so a crashed holder only costs CACHE_LEASE
+        while value is _MISSING and not self._try(self.claim, True, key, CACHE_LEASE):
+            time.sleep(CACHE_POLL)
+            value = self._try(self.get, _MISSING, key)
+        if value is not _MISSING:
+            return value, True
+        try:
+            # The previous holder may have stored and released since our last look
+            value = self._try(self.get, _MISSING, key)
+            if value is not _MISSING:
+                return value, True
+            value = fill()
+            # A fill that outlasts its window still has to reach the replicas waiting on it
+            self._try(self.set, None, key, value, max(expires_at, time.time() + CACHE_LEASE))
+            return value, False
+        finally:
+            self._try(self.release, None, key)
+
+
+class SQLiteCache(CacheBackend):
+    """Shared cache in one SQLite file (WAL, memory-mapped reads) for replicas on the same host."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), timeout=5, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA mmap_size=268435456")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY, value BLOB, expires REAL
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS leases (
+                    key TEXT PRIMARY KEY, expires REAL
+                ) WITHOUT ROWID;
+            """)
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ? AND expires > ?",
+                                     (key, time.time())).fetchone()
+        return load_value(row[0]) if row else _MISSING
+
+    def set(self, key: str, value, expires_at: float):
+        blob = dump_value(value)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+            self._conn.execute("INSERT OR REPLACE INTO entries VALUES (?,?,?)", (key, blob, expires_at))
+
+    def claim(self, key: str, lease: float) -> bool:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND expires <= ?", (key, now))
+            cur = self._conn.execute("INSERT OR IGNORE INTO leases VALUES (?,?)", (key, now + lease))
+        return cur.rowcount == 1
+
+    def release(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM leases WHERE key = ?", (key,))
+
+
+class RedisCache(CacheBackend):
+    """
+    Shared cache on a Redis-protocol server (Redis, Valkey, KeyDB...) for
+    replicas on several hosts. A minimal RESP client over one socket — only
+    GET, SET (PX / NX) and DEL — so no client library is required.
+    """
+
+    def __init__(self, host: str, port: int = 6379, db: int = 0, prefix: str = "macro:"):
+        self._addr, self._db, self._prefix = (host, port), db, prefix
+        self._lock = threading.Lock()
+        self._sock = self._file = None
+
+    def _send(self, *parts):
+        chunks = [b"*%d\r\n" % len(parts)]
+        for part in parts:
+            data = part if isinstance(part, bytes) else str(part).encode()
+            chunks.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(chunks))
+        return self._reply()
+
+    def _reply(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            return None if n < 0 else self._file.read(n + 2)[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._reply() for _ in range(n)]
+        raise ValueError(f"unexpected RESP reply {line!r}")
+
+    def _command(self, *parts):
+        with self._lock:
+            try:
+                if self._sock is None:
+                    self._sock = socket.create_connection(self._addr, timeout=2)
+                    self._file = self._sock.makefile("rb")
+                    if self._db:
+                        self._send("SELECT", self._db)
+                return self._send(*parts)
+            except (OSError, ValueError):
+                # Reconnect on the next command
+                if self._sock is not None:
+                    self._sock.close()
+                self._sock = self._file = None
+                raise
+
+    def get(self, key: str):
+        blob = self._command("GET", self._prefix + key)
+        return _MISSING if blob is None else load_value(blob)
+
+    def set(self, key: str, value, expires_at: float):
+        ms = int((expires_at - time.time()) * 1000)
+        if ms > 0:
+            self._command("SET", self._prefix + key, dump_value(value), "PX", ms)
+
+    def claim(self, key: str, lease: float) -> bool:
+        return self._command("SET", f"{self._prefix}{key}:lease", 1, "NX", "PX", int(lease * 1000)) == "OK"
+
+    def release(self, key: str):
+        self._command("DEL", f"{self._prefix}{key}:lease")
+
+
+@singleton
+def shared_cache() -> CacheBackend | None:
+    """The backend named by MACRO_CACHE_URL, or None when sharing is off."""
+    url = urlsplit(CACHE_URL)
+    if url.scheme == "sqlite":
+        return SQLiteCache(Path(url.path))
+    if url.scheme == "redis":
+        return RedisCache(url.hostname or "localhost", url.port or 6379, int(url.path.strip("/") or 0))
+    return None
+
+
+def call_key(args: tuple, kwargs: dict) -> str:
+    """Stable digest of call arguments, the same in every process."""
+    return hashlib.sha1(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+
+
+def shared_call(name: str, ttl: int, window: int, fn, args: tuple = (), kwargs: dict = None):
+    """
+    fn(*args, **kwargs) through shared_cache(). Entries live for one aligned
+    window (window = epoch seconds // ttl) and expire at its end on every
+    replica, so each window costs one upstream fetch however many replicas run.
+    A shared hit marks the running instrumented call as a hit.
+    """
+    kwargs = kwargs or {}
+    backend = shared_cache()
+    if backend is None:
+        return fn(*args, **kwargs)
+    key = f"v{CACHE_VERSION}:{name}:{window}:{call_key(args, kwargs)}"
+    value, hit = backend.fetch_through(key, (window + 1) * ttl, lambda: fn(*args, **kwargs))
+    stats = _call_stats.get()
+    if hit and stats is not None:
+        stats["hit"] = True
+    return value
+
+
+# ─────────────────────────────────────────────────────────────
+# DATA FETCHING
+# ─────────────────────────────────────────────────────────────
+
+# Every Yahoo snapshot universe, fetched together in one batched download
+SNAPSHOT_SYMBOLS = tuple(dict.fromkeys(
+    i["symbol"] for group in flagged_groups("snapshot") for i in group_instruments(group)
+))
+YF_CHUNK_SIZE = 200      # max symbols per yf.download call
+YF_CHUNK_THREADS = 8     # requests in flight per chunk (yfinance sends one per symbol)
+YF_CONCURRENCY = 4       # chunks downloading at once, process-wide
+
+
+def plan_chunks(symbols, max_size: int = YF_CHUNK_SIZE, threads: int = YF_CHUNK_THREADS,
+                workers: int = YF_CONCURRENCY) -> list:
+    """
+    Split symbols into evenly sized download chunks: one per worker while
+    each chunk still fills its threads, more only when a chunk would exceed
+    max_size. A handful of symbols stays one call; a large universe keeps
+    every worker busy, and no chunk trails behind on a short last batch.
+    """
+    n = len(symbols)
+    if not n:
+        return []
+    count = max(-(-n // max_size), min(workers, -(-n // threads)))
+    size = -(-n // count)
+    return [list(symbols[i:i + size]) for i in range(0, n, size)]
+
+
+@singleton
+def yahoo_pool() -> ThreadPoolExecutor:
+    """Process-wide pool every chunked Yahoo download runs on — at most YF_CONCURRENCY at once."""
+    return ThreadPoolExecutor(max_workers=YF_CONCURRENCY, thread_name_prefix="yahoo")
+
+
+def run_chunked(symbols, download) -> list:
+    """
+    download(chunk, threads) for every chunk of plan_chunks(symbols) on the
+    shared pool, results in chunk order. However many fetchers run at once,
+    no more than YF_CONCURRENCY × YF_CHUNK_THREADS Yahoo requests are in flight.
+    """
+    chunks = plan_chunks(symbols)
+    return list(yahoo_pool().map(download, chunks, [YF_CHUNK_THREADS] * len(chunks)))
+
+
+def _yf_field(raw: pd.DataFrame, field: str, symbols: list) -> pd.DataFrame:
+    """One OHLCV field as a date × symbol frame, whatever column layout yfinance returns."""
+    frame = raw[field]
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame(symbols[0])
+    return frame
+
+
+def _download_closes(chunk: list, threads: int) -> pd.DataFrame | None:
+    """Two days of closes for one chunk (None when the download failed)."""
+    import yfinance as yf
+    try:
+        with guarded("yahoo") as timeout:
+            raw = yf.download(chunk, period="2d", interval="1d", group_by="column",
+                              progress=False, threads=threads, timeout=timeout)
+            if raw.empty:
+                # yfinance reports network errors as an empty frame; 2d always has bars
+                raise ValueError("empty download")
+        return _yf_field(raw, "Close", chunk)
+    except Exception:
+        return None
+
+
+def fetch_yf_universe(symbols: tuple) -> pd.DataFrame:
+    """
+    Snapshot every symbol in batched Yahoo downloads, planned into
+    concurrent chunks by run_chunked.
+    Returns a frame indexed by symbol with columns price/prev/chg/pct/ok.
+    """
+    frames = [f for f in run_chunked(symbols, _download_closes) if f is not None]
+    closes = pd.concat(frames, axis=1) if frames else pd.DataFrame(index=pd.DatetimeIndex([]))
+    closes = closes.loc[:, ~closes.columns.duplicated()].reindex(columns=list(symbols))
+    if closes.empty:
+        last = prev = pd.Series(float("nan"), index=list(symbols))
+    else:
+        # Last valid close, and the valid close before it, for every column at once
+        filled = closes.ffill()
+        last = filled.iloc[-1]
+        prev = filled.shift(1).where(closes.notna()).ffill().iloc[-1]
+    chg = (last - prev).fillna(0.0)
+    pct = (chg / prev * 100).fillna(0.0)
+    return pd.DataFrame({"price": last, "prev": prev, "chg": chg, "pct": pct, "ok": last.notna()})
+
+
+def snapshot_slice(snapshot: pd.DataFrame, tickers: dict) -> dict:
+    """Read {label: {"price", "chg", "pct", "ok"}} for a {label: ticker} universe."""
+    results = {}
+    for label, sym in tickers.items():
+        if sym in snapshot.index and snapshot.at[sym, "ok"]:
+            row = snapshot.loc[sym]
+            results[label] = {"price": float(row["price"]), "chg": float(row["chg"]),
+                              "pct": float(row["pct"]), "ok": True}
+            if "open" in row and pd.notna(row["open"]):
+                # Intraday snapshots also carry the change since the session open
+                results[label].update(open=float(row["open"]), open_pct=float(row["open_pct"]))
+        else:
+            results[label] = {"price": None, "chg": 0, "pct": 0, "ok": False}
+    return results
+
+
+# Charted tickers — their full history comes down in one multi-ticker call
+HISTORY_TICKERS = ("FGBL=F", "FGBS=F", "EURUSD=X", "USDJPY=X", "BTC-USD")
+HISTORY_MAX_PERIOD = "2y"
+PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y":  pd.DateOffset(years=1),
+    "2y":  pd.DateOffset(years=2),
+}
+
+
+def _download_bars(tickers: list, interval: str = "1d", answered: set = None, **window) -> dict:
+    """
+    Multi-ticker downloads (daily by default), chunked by run_chunked → {ticker: OHLCV DataFrame}.
+    answered, if given, collects the tickers of every chunk upstream answered, data or not.
+    """
+    def download(chunk: list, threads: int) -> dict:
+        import yfinance as yf
+        try:
+            # No empty-frame check here: a start= window can legitimately have no new bars
+            with guarded("yahoo") as timeout:
+                raw = yf.download(chunk, interval=interval, group_by="ticker",
+                                  progress=False, threads=threads, timeout=timeout, **window)
+        except Exception:
+            return {}
+        if answered is not None:
+            answered.update(chunk)
+        bars = {}
+        for ticker in chunk:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if ticker not in raw.columns.get_level_values(0):
+                    continue
+                df = raw[ticker]
+            else:
+                df = raw
+            df = df.dropna(how="all")
+            if not df.empty:
+                bars[ticker] = df
+        return bars
+
+    return {t: df for bars in run_chunked(tickers, download) for t, df in bars.items()}
+
+
+def fetch_yf_histories(tickers: tuple) -> dict:
+    """
+    Return HISTORY_MAX_PERIOD of daily OHLCV for every ticker from the local
+    store. Tickers never seen before get the full window in one download;
+    known tickers only fetch bars from their last stored date onwards. A
+    ticker the backfill came back empty for is marked backfilled and rides
+    along with the incremental request from then on.
+    Shorter lookbacks are sliced from these frames with slice_period().
+    Returns {ticker: OHLCV DataFrame}
+    """
+    store = timeseries_store()
+    keys = {f"BARS:{t}": t for t in tickers}   # backfills share the yields' table
+    last = store.last_dates("bars", list(tickers))
+    done = {keys[k] for k in store.backfilled(list(keys))} | set(last)
+    new = [t for t in tickers if t not in done]
+    known = [t for t in tickers if t in done]
+    if new:
+        answered = set()
+        for ticker, df in _download_bars(new, answered=answered, period=HISTORY_MAX_PERIOD).items():
+            store.upsert_bars(ticker, df)
+        # Upstream answered these: whatever it left out has nothing to backfill
+        store.mark_backfilled([f"BARS:{t}" for t in new if t in answered])
+    if last:
+        # The last stored bar is re-fetched: it may have been a partial day. The start
+        # comes from stored tickers only, so an empty one doesn't widen the request
+        start = min(last.values())
+        for ticker, df in _download_bars(known, start=start.strftime("%Y-%m-%d")).items():
+            store.upsert_bars(ticker, df)
+    return stored_yf_histories(tickers)
+
+
+def stored_yf_histories(tickers: tuple) -> dict:
+    """HISTORY_MAX_PERIOD of daily OHLCV per ticker, from the local store only."""
+    start = pd.Timestamp.today().normalize() - PERIOD_OFFSETS[HISTORY_MAX_PERIOD]
+    return timeseries_store().read_bars(list(tickers), start=start)
+
+
+def slice_period(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Trim a long history to a lookback like '3mo', counted back from its last bar."""
+    if df.empty or period not in PERIOD_OFFSETS:
+        return df
+    return df[df.index >= df.index[-1] - PERIOD_OFFSETS[period]]
+
+
+# Intraday bars kept in memory per interval (Yahoo serves 1m for 30 days); coarser bars are resampled
+INTRADAY_RETENTION = {"1m": pd.Timedelta(days=5)}
+INTRADAY_SESSION_GAP = pd.Timedelta(minutes=45)   # a longer pause between bars starts a new session
+
+
+class IntradayBuffer:
+    """In-memory OHLCV bars per symbol for one intraday interval, UTC-indexed, trimmed to a retention window."""
+
+    def __init__(self, retention: pd.Timedelta):
+        self.retention = retention
+        self._bars = {}
+        self._lock = threading.Lock()
+
+    def last_times(self, symbols) -> dict:
+        """{symbol: time of its newest bar} for the symbols held."""
+        with self._lock:
+            return {s: self._bars[s].index[-1] for s in symbols if s in self._bars}
+
+    def merge(self, symbol: str, df: pd.DataFrame):
+        """Fold in freshly downloaded bars; they replace any held bar from their first one on."""
+        df = df[df["Close"].notna()]
+        if df.empty:
+            return
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
+        df.index = df.index.tz_convert("UTC") if df.index.tz else df.index.tz_localize("UTC")
+        with self._lock:
+            held = self._bars.get(symbol)
+            if held is not None:
+                # The newest held bar may have been partial; the delta re-fetches it
+                df = pd.concat([held.iloc[:held.index.searchsorted(df.index[0])], df])
+            self._bars[symbol] = df.iloc[df.index.searchsorted(df.index[-1] - self.retention):]
+
+    def bars(self, symbols) -> dict:
+        with self._lock:
+            return {s: self._bars[s] for s in symbols if s in self._bars}
+
+
+@singleton
+def intraday_buffers() -> dict:
+    """Process-wide {interval: IntradayBuffer}."""
+    return {interval: IntradayBuffer(retention) for interval, retention in INTRADAY_RETENTION.items()}
+
+
+def fetch_yf_intraday(symbols: tuple, interval: str = "1m") -> dict:
+    """
+    Intraday OHLCV for every symbol from the in-memory buffer, topped up
+    from Yahoo. Symbols not held yet get the full retention window; held
+    ones only request bars from their newest held bar on, grouped by the
+    hour of that bar so a closed market's delta doesn't widen everyone
+    else's. Returns {symbol: OHLCV DataFrame} (UTC index).
+    """
+    buffer = intraday_buffers()[interval]
+    last = buffer.last_times(symbols)
+    oldest = pd.Timestamp.now(tz="UTC") - buffer.retention
+    groups = {}
+    for sym in symbols:
+        start = max(last[sym], oldest) if sym in last else oldest
+        groups.setdefault(start.floor("h") if sym in last else None, []).append((sym, start))
+    for members in groups.values():
+        start = min(s for _, s in members)
+        for sym, df in _download_bars([m for m, _ in members], interval=interval, start=start).items():
+            buffer.merge(sym, df)
+    return buffer.bars(symbols)
+
+
+def session_starts(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Positions of the bars that open a trading session: the first bar after
+    a pause longer than INTRADAY_SESSION_GAP or, for markets that never
+    pause (FX, crypto), the first bar of each UTC day.
+    """
+    breaks = np.diff(index.as_unit("ns").asi8) > INTRADAY_SESSION_GAP.value
+    if not breaks.any():
+        days = index.normalize().asi8
+        breaks = days[1:] != days[:-1]
+    return np.flatnonzero(np.r_[True, breaks])
+
+
+def intraday_snapshot(bars: dict, symbols: tuple) -> pd.DataFrame:
+    """
+    fetch_yf_universe's frame from intraday bars: change vs the prior
+    session's last close (chg/pct) and vs the current session's open
+    (open/open_chg/open_pct), by symbol.
+    """
+    rows = {}
+    for sym in symbols:
+        df = bars.get(sym)
+        if df is None or df.empty:
+            continue
+        close = df["Close"].to_numpy()
+        start = session_starts(df.index)[-1]
+        opened = df["Open"].iat[start]
+        rows[sym] = (close[-1], close[start - 1] if start else np.nan,
+                     close[start] if np.isnan(opened) else opened)
+    frame = pd.DataFrame.from_dict(rows, orient="index", columns=["price", "prev", "open"])
+    frame = frame.reindex(list(symbols)).astype(float)
+    last, prev, opened = frame["price"], frame["prev"], frame["open"]
+    chg, open_chg = (last - prev).fillna(0.0), (last - opened).fillna(0.0)
+    return pd.DataFrame({"price": last, "prev": prev, "chg": chg, "pct": (chg / prev * 100).fillna(0.0),
+                         "ok": last.notna(), "open": opened, "open_chg": open_chg,
+                         "open_pct": (open_chg / opened * 100).fillna(0.0)})
+
+
+def resample_bars(df: pd.DataFrame, rule: str) -> pd.DataFrame:
+    """Coarser OHLCV bars (e.g. 5min from 1m); empty buckets dropped."""
+    agg = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+    return df.resample(rule).agg({c: f for c, f in agg.items() if c in df}).dropna(subset=["Close"])
+
+
+def fetch_fred_yields(api_key: str = "") -> dict:
+    """
+    Fetch US treasury yields from FRED.
+    If no API key, tries public JSON endpoint (observation limit applies).
+    Observations are appended to the local store; only dates from the
+    last stored one onwards are requested.
+    Returns {tenor: latest_yield_pct}
+    """
+    store = timeseries_store()
+    last = store.last_dates("yields", [f"FRED:{t}" for t in FRED_SERIES])
+    base = "https://fred.stlouisfed.org/graph/fredgraph.json"
+    for tenor, series in FRED_SERIES.items():
+        try:
+            url = f"{base}?id={series}"
+            if api_key:
+                url += f"&api_key={api_key}"
+            if f"FRED:{tenor}" in last:
+                url += f"&cosd={last[f'FRED:{tenor}'].strftime('%Y-%m-%d')}"
+            r = http_get(url)
+            if r.status_code == 200:
+                data = r.json()
+                # fredgraph returns {dates: [...], values: [...]}
+                points = {d: float(v) for d, v in zip(data.get("dates", []), data.get("values", []))
+                          if v not in (".", None)}
+                store.upsert_yields(f"FRED:{tenor}", points)
+        except Exception:
+            pass
+    return stored_fred_yields()
+
+
+def stored_fred_yields() -> dict:
+    """{tenor: latest stored US yield}, from the local store only."""
+    latest = timeseries_store().latest_yields([f"FRED:{t}" for t in FRED_SERIES])
+    return {t: latest[f"FRED:{t}"] for t in FRED_SERIES if f"FRED:{t}" in latest}
+
+
+ECB_BASE_URL = "https://data-api.ecb.europa.eu/service/data"
+YIELD_BACKFILL = pd.DateOffset(years=2)   # history pulled on a series' first fetch
+
+
+@singleton
+def fetch_stats() -> dict:
+    """Process-wide counters for the last uncached refresh of each source."""
+    return {}
+
+
+def _ecb_key(countries: list, tenors: list) -> str:
+    """Multi-value SDMX key: '+' ORs countries and tenors into one query."""
+    cc = "+".join(f"G_N_{c}" for c in countries)
+    tt = "+".join(f"SR_{ECB_TENORS[t]}Y" for t in tenors)
+    return f"YC/B.U2.EUR.4F.{cc}.SV_C_YM.{tt}"
+
+
+def _parse_ecb_jsondata(jd: dict) -> dict:
+    """Map a combined SDMX-JSON payload to {country: {tenor: {date: yield_pct}}}."""
+    dims = jd["structure"]["dimensions"]["series"]
+    periods = [v["id"] for v in jd["structure"]["dimensions"]["observation"][0]["values"]]
+    tenor_by_code = {f"SR_{yr}Y": label for label, yr in ECB_TENORS.items()}
+    out = {}
+    for series_key, series in jd["dataSets"][0]["series"].items():
+        # Series keys are positional indices into the dimension value lists
+        ids = [dims[i]["values"][int(pos)]["id"] for i, pos in enumerate(series_key.split(":"))]
+        country = next((x[len("G_N_"):] for x in ids if x.startswith("G_N_")), None)
+        tenor = next((tenor_by_code[x] for x in ids if x in tenor_by_code), None)
+        if country is None or tenor is None:
+            continue
+        points = {periods[int(i)]: obs[0] for i, obs in series.get("observations", {}).items()
+                  if obs and obs[0] is not None}
+        if points:
+            out.setdefault(country, {})[tenor] = points
+    return out
+
+
+def _fetch_ecb_chunk(countries: list, tenors: list, query: str) -> tuple[dict, int]:
+    """
+    Fetch one batched chunk of ECB series.
+    On a failed batch the chunk is split in half (countries first, then tenors)
+    and retried. Timeouts are not split: smaller queries would time out too.
+    Returns ({country: {tenor: {date: yield_pct}}}, round_trips).
+    """
+    import requests
+
+    url = f"{ECB_BASE_URL}/{_ecb_key(countries, tenors)}?{query}&format=jsondata"
+    try:
+        r = http_get(url, headers={"Accept": "application/json"})
+        if r.status_code == 404:
+            # No series in this chunk exist upstream — nothing to split
+            return {}, 1
+        r.raise_for_status()
+        return _parse_ecb_jsondata(r.json()), 1
+    except (requests.Timeout, requests.ConnectionError, CircuitOpen):
+        return {}, 1
+    except Exception:
+        if len(countries) > 1:
+            mid = len(countries) // 2
+            halves = [(countries[:mid], tenors), (countries[mid:], tenors)]
+        elif len(tenors) > 1:
+            mid = len(tenors) // 2
+            halves = [(countries, tenors[:mid]), (countries, tenors[mid:])]
+        else:
+            return {}, 1
+        merged, trips = {}, 1
+        for cc, tt in halves:
+            part, n = _fetch_ecb_chunk(cc, tt, query)
+            trips += n
+            for country, vals in part.items():
+                merged.setdefault(country, {}).update(vals)
+        return merged, trips
+
+
+def fetch_ecb_yields() -> dict:
+    """
+    Fetch EUR sovereign yields from ECB Statistical Data Warehouse.
+    Returns {country: {tenor: yield_pct}}
+    ECB SDW REST API — no key required.
+    All countries × tenors go out as one multi-value SDMX query; the
+    round-trip count of the refresh is recorded in fetch_stats()["ecb"].
+    Observations are appended to the local store: a series' first run
+    backfills YIELD_BACKFILL, later runs only ask for dates after the last
+    stored one. A series upstream has no data for is marked backfilled too,
+    so it never forces the full window again.
+    """
+    store = timeseries_store()
+    series = {(c, t): f"ECB:{c}:{t}" for c in ECB_COUNTRIES for t in ECB_TENORS}
+    last = store.last_dates("yields", list(series.values()))
+    done = store.backfilled(list(series.values())) | set(last)
+    pending = [k for k, key in series.items() if key not in done]
+    stored = [k for k, key in series.items() if key in last]
+    round_trips = 0
+    # ECB SDW yield curve dataset: YC (yield curves)
+    # Series key: YC.B.U2.EUR.4F.G_N_{country}.SV_C_YM.SR_{tenor}Y
+    queries = []
+    if pending:
+        queries.append((pending, pd.Timestamp.today().normalize() - YIELD_BACKFILL))
+    if stored:
+        # Series upstream never had (e.g. outside the euro-area dataset) don't hold this back
+        queries.append((stored, min(last[series[k]] for k in stored)))
+    for keys, start in queries:
+        countries = [c for c in ECB_COUNTRIES if any(k[0] == c for k in keys)]
+        tenors = [t for t in ECB_TENORS if any(k[1] == t for k in keys)]
+        fetched, trips = _fetch_ecb_chunk(countries, tenors, f"startPeriod={start.strftime('%Y-%m-%d')}")
+        round_trips += trips
+        for country, vals in fetched.items():
+            for tenor, points in vals.items():
+                if (country, tenor) in series:
+                    store.upsert_yields(series[(country, tenor)], points)
+        if fetched and keys is pending:
+            # Upstream answered: whatever it left out has nothing to backfill
+            store.mark_backfilled([series[k] for k in pending])
+    fetch_stats()["ecb"] = {"round_trips": round_trips, "at": datetime.utcnow()}
+    return stored_ecb_yields()
+
+
+def stored_ecb_yields() -> dict:
+    """{country: {tenor: latest stored yield}}, from the local store only."""
+    series = {(c, t): f"ECB:{c}:{t}" for c in ECB_COUNTRIES for t in ECB_TENORS}
+    latest = timeseries_store().latest_yields(list(series.values()))
+    results = {c: {} for c in ECB_COUNTRIES}
+    for (country, tenor), key in series.items():
+        if key in latest:
+            results[country][tenor] = latest[key]
+    return results
+
+
+def fetch_coingecko() -> dict:
+    """Fetch prices and 24h change of every COINGECKO_IDS coin from CoinGecko (free, no key)."""
+    if not COINGECKO_IDS:
+        return {}
+    try:
+        url = "https://api.coingecko.com/api/v3/simple/price"
+        params = {
+            "ids": ",".join(cg_id for cg_id, _ in COINGECKO_IDS.values()),
+            "vs_currencies": "usd",
+            "include_24hr_change": "true",
+            "include_market_cap": "true",
+        }
+        r = http_get(url, params=params)
+        if r.status_code == 200:
+            return r.json()
+    except Exception:
+        pass
+    return {}
+
+
+class EtfFlowBook:
+    """
+    Dollar volume and a money-flow proxy per spot ETF (date × ticker) plus the
+    aggregate daily and cumulative flow, kept across refreshes. sync() redoes
+    the last date held (it may have been partial) and starts over when the
+    ticker list changes.
+    """
+
+    def __init__(self):
+        self.tickers = []
+        self.close = self.volume = self.dollar_volume = self.flow = pd.DataFrame()
+        self.daily = self.cumulative = pd.Series(dtype=float)
+        self._lock = threading.Lock()
+
+    def sync(self, histories: dict, tickers: list):
+        with self._lock:
+            start = self.flow.index[-1] if tickers == self.tickers and not self.flow.empty else None
+            self.tickers = list(tickers)
+            frames = {t: histories[t] if start is None else histories[t][histories[t].index >= start]
+                      for t in tickers if t in histories}
+            if not frames:
+                return
+            wide = pd.concat(frames, axis=1)
+            close, high, low, volume = (wide.xs(f, axis=1, level=1).reindex(columns=tickers)
+                                        for f in ("Close", "High", "Low", "Volume"))
+            # Where the close sits in the day's range: +1 at the high, -1 at the low
+            span = (high - low).to_numpy()
+            clv = np.divide((2 * close - high - low).to_numpy(), span,
+                            out=np.zeros_like(span), where=span > 0)
+            dollar_volume = close * volume
+            flow = dollar_volume * clv
+            daily = flow.sum(axis=1, min_count=1)
+
+            def extend(held, new):
+                return new if start is None else pd.concat([held[held.index < start], new])
+
+            base = 0.0
+            if start is not None:
+                before = self.cumulative[self.cumulative.index < start]
+                base = before.iloc[-1] if len(before) else 0.0
+            self.close, self.volume = extend(self.close, close), extend(self.volume, volume)
+            self.dollar_volume, self.flow = extend(self.dollar_volume, dollar_volume), extend(self.flow, flow)
+            self.daily = extend(self.daily, daily)
+            self.cumulative = extend(self.cumulative, base + daily.fillna(0.0).cumsum())
+
+    def latest(self) -> pd.DataFrame:
+        """Per ticker: last price, volume, volume change vs the bar before, $ volume and flow."""
+        with self._lock:
+            close, volume, dollar_volume, flow = self.close, self.volume, self.dollar_volume, self.flow
+        if close.empty:
+            return pd.DataFrame(columns=["price", "volume", "vol_chg", "vol_usd", "flow"])
+        last_vol = volume.ffill().iloc[-1]
+        prev_vol = volume.shift(1).where(volume.notna()).ffill().iloc[-1]
+        return pd.DataFrame({
+            "price": close.ffill().iloc[-1], "volume": last_vol,
+            "vol_chg": (last_vol - prev_vol).fillna(0.0),
+            "vol_usd": dollar_volume.ffill().iloc[-1], "flow": flow.ffill().iloc[-1],
+        })
+
+
+@singleton
+def etf_flow_book() -> EtfFlowBook:
+    """Process-wide flow book behind fetch_etf_flows."""
+    return EtfFlowBook()
+
+
+def fetch_etf_flows(tickers: dict) -> dict:
+    """
+    Spot BTC ETF volumes and flows: every ETF's daily bars come down in one
+    batched (incremental) history download, then the flow book moves forward.
+    Returns {"etfs": {name: {"price", "volume", "vol_chg", "vol_usd", "flow"}},
+             "daily": aggregate flow proxy ($/day), "cumulative": its running total,
+             "dollar_volume": aggregate $ volume per day}
+    """
+    histories = fetch_yf_histories(tuple(tickers.values()))
+    book = etf_flow_book()
+    book.sync(histories, list(tickers.values()))
+    latest = book.latest()
+    etfs = {}
+    for name, sym in tickers.items():
+        if sym in latest.index and pd.notna(latest.at[sym, "price"]):
+            row = latest.loc[sym]
+            etfs[name] = {"price": float(row["price"]),
+                          "volume": int(row["volume"]) if pd.notna(row["volume"]) else None,
+                          "vol_chg": float(row["vol_chg"]), "vol_usd": float(row["vol_usd"]),
+                          "flow": float(row["flow"])}
+        else:
+            etfs[name] = {"price": None, "volume": None, "vol_chg": 0, "vol_usd": None, "flow": None}
+    return {"etfs": etfs, "daily": book.daily, "cumulative": book.cumulative,
+            "dollar_volume": book.dollar_volume.sum(axis=1, min_count=1)}
+
+
+# ─────────────────────────────────────────────────────────────
+# HISTORICAL SPREAD ENGINE
+# ─────────────────────────────────────────────────────────────
+
+# Store series behind each (country, tenor) of the yield cube
+CUBE_COUNTRIES = list(ECB_COUNTRIES) + ["US"]
+CUBE_SERIES = {
+    (c, t): (f"FRED:{t}" if c == "US" else f"ECB:{c}:{t}")
+    for c in CUBE_COUNTRIES for t in TENORS
+}
+
+
+class YieldCube:
+    """
+    Dense date × country × tenor yield history (in %), with every pairwise
+    country spread, every tenor slope and every box computed over the whole
+    history by array broadcasting. Accessors return bp series for spread_chart.
+    """
+
+    def __init__(self, dates: pd.DatetimeIndex, values: np.ndarray, countries: list, tenors: list):
+        self.dates, self.values = dates, values
+        self.countries, self.tenors = list(countries), list(tenors)
+        self._ci = {c: i for i, c in enumerate(self.countries)}
+        self._ti = {t: i for i, t in enumerate(self.tenors)}
+        y = values
+        # spreads[d, i, j, t] = y[d, i, t] - y[d, j, t]
+        self.spreads = (y[:, :, None, :] - y[:, None, :, :]) * 100
+        # slopes[d, c, a, b] = y[d, c, b] - y[d, c, a]   (t2 - t1, as compute_curve_spread)
+        self.slopes = (y[:, :, None, :] - y[:, :, :, None]) * 100
+        # boxes[d, i, j, a, b] = slopes[d, i, a, b] - slopes[d, j, a, b]
+        self.boxes = self.slopes[:, :, None, :, :] - self.slopes[:, None, :, :, :]
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, countries: list, tenors: list, series: dict) -> "YieldCube":
+        """Build from a date × series frame (as TimeSeriesStore.read_yields returns)."""
+        keys = [series[(c, t)] for c in countries for t in tenors]
+        frame = frame.reindex(columns=keys)
+        values = frame.to_numpy(dtype=float).reshape(len(frame), len(countries), len(tenors))
+        return cls(pd.DatetimeIndex(frame.index), values, countries, tenors)
+
+    def _series(self, arr: np.ndarray, name: str) -> pd.Series:
+        return pd.Series(arr, index=self.dates, name=name).dropna()
+
+    def spread(self, c1: str, c2: str, tenor: str) -> pd.Series:
+        """c1 - c2 at one tenor, bp."""
+        return self._series(self.spreads[:, self._ci[c1], self._ci[c2], self._ti[tenor]],
+                            f"{c1}-{c2} {tenor}")
+
+    def slope(self, country: str, t1: str, t2: str) -> pd.Series:
+        """t2 - t1 for one country, bp."""
+        return self._series(self.slopes[:, self._ci[country], self._ti[t1], self._ti[t2]],
+                            f"{country} {t1}/{t2}")
+
+    def box(self, c1: str, c2: str, t1: str, t2: str) -> pd.Series:
+        """(c1 slope) - (c2 slope), bp."""
+        return self._series(self.boxes[:, self._ci[c1], self._ci[c2], self._ti[t1], self._ti[t2]],
+                            f"{c1}-{c2} {t1}/{t2}")
+
+
+def build_yield_cube(store: TimeSeriesStore) -> YieldCube:
+    """Yield cube over everything in the store."""
+    frame = store.read_yields(list(CUBE_SERIES.values()))
+    return YieldCube.from_frame(frame, CUBE_COUNTRIES, TENORS, CUBE_SERIES)
+
+
+# ─────────────────────────────────────────────────────────────
+# CURVE FITTING (Nelson-Siegel)
+# ─────────────────────────────────────────────────────────────
+
+TENOR_YEARS = {t: float(t[:-1]) for t in TENORS}
+NS_LAMBDA_GRID = np.geomspace(0.03, 3.0, 48)   # decay candidates (1/years) for a cold fit
+NS_WARM_BRACKET = np.geomspace(0.8, 1.25, 9)   # multiples of yesterday's decay for a warm fit
+
+
+def ns_loadings(tau, lam) -> np.ndarray:
+    """Nelson-Siegel factor loadings [level, slope, curvature]; tau and lam broadcast."""
+    x = np.maximum(lam * tau, 1e-9)
+    slope = (1 - np.exp(-x)) / x
+    return np.stack([np.ones_like(slope), slope, slope - np.exp(-x)], axis=-1)
+
+
+def _ns_solve(tau: np.ndarray, y: np.ndarray, mask: np.ndarray, lam: np.ndarray):
+    """
+    Least-squares betas of every curve at each of its candidate decays.
+    tau (T,), y/mask (N, T), lam (N, L) → betas (N, L, 3), sse (N, L)
+    """
+    X = ns_loadings(tau[None, None, :], lam[..., None])            # (N, L, T, 3)
+    Xw = X * mask[:, None, :, None]
+    A = Xw.swapaxes(-1, -2) @ X + 1e-10 * np.eye(3)
+    b = Xw.swapaxes(-1, -2) @ y[:, None, :, None]
+    beta = np.linalg.solve(A, b)[..., 0]
+    resid = (X @ beta[..., None])[..., 0] - y[:, None, :]
+    return beta, (resid ** 2 * mask[:, None, :]).sum(-1)
+
+
+def fit_nelson_siegel(tau, yields, lam0=None, refine_steps: int = 24) -> np.ndarray:
+    """
+    Fit a Nelson-Siegel curve to every row of yields (N, T) at once.
+    The decay is picked from NS_LAMBDA_GRID — or, when warm-started with the
+    previous day's lam0 (N,), from a narrow bracket around it — then refined
+    by a vectorized golden-section search. Curves with < 3 points get NaN.
+    Returns params (N, 4): b0, b1, b2, lambda.
+    """
+    tau = np.asarray(tau, dtype=float)
+    y = np.atleast_2d(np.asarray(yields, dtype=float))
+    n = len(y)
+    mask = np.isfinite(y)
+    y0 = np.where(mask, y, 0.0)
+    warm = np.zeros(n, dtype=bool) if lam0 is None else np.isfinite(lam0)
+    lo, hi = np.empty(n), np.empty(n)
+    for rows, grid in ((~warm, None), (warm, NS_WARM_BRACKET)):
+        if not rows.any():
+            continue
+        cand = (np.broadcast_to(NS_LAMBDA_GRID, (rows.sum(), len(NS_LAMBDA_GRID))) if grid is None
+                else np.asarray(lam0)[rows, None] * grid[None, :])
+        _, sse = _ns_solve(tau, y0[rows], mask[rows], cand)
+        best = sse.argmin(1)
+        idx = np.arange(len(best))
+        lo[rows] = cand[idx, np.maximum(best - 1, 0)]
+        hi[rows] = cand[idx, np.minimum(best + 1, cand.shape[1] - 1)]
+
+    # Golden-section search on log(lambda) between the neighbouring candidates
+    g = (np.sqrt(5) - 1) / 2
+    a, b = np.log(lo), np.log(hi)
+    for _ in range(refine_steps):
+        c, d = b - g * (b - a), a + g * (b - a)
+        _, fc = _ns_solve(tau, y0, mask, np.exp(c)[:, None])
+        _, fd = _ns_solve(tau, y0, mask, np.exp(d)[:, None])
+        left = fc[:, 0] < fd[:, 0]
+        a, b = np.where(left, a, c), np.where(left, d, b)
+    lam = np.exp((a + b) / 2)
+    beta, _ = _ns_solve(tau, y0, mask, lam[:, None])
+    params = np.column_stack([beta[:, 0, :], lam])
+    params[mask.sum(1) < 3] = np.nan
+    return params
+
+
+def ns_yield(params: np.ndarray, tau) -> np.ndarray:
+    """Fitted yields for params (..., 4) at maturity tau (years): scalar → (...), (K,) → (..., K)."""
+    tau = np.asarray(tau, dtype=float)
+    p = params[..., None, :] if tau.ndim else params
+    return (ns_loadings(tau, p[..., 3]) * p[..., :3]).sum(-1)
+
+
+class CurveFit:
+    """
+    Nelson-Siegel parameters for every date × country of a YieldCube,
+    with fitted yields and forwards at any maturity.
+    """
+
+    def __init__(self, dates: pd.DatetimeIndex, countries: list, params: np.ndarray):
+        self.dates, self.countries, self.params = dates, list(countries), params
+
+    def yields(self, tau: float) -> pd.DataFrame:
+        """Fitted yield at maturity tau (years), date × country."""
+        return pd.DataFrame(ns_yield(self.params, tau), index=self.dates, columns=self.countries)
+
+    def forward(self, start: float, length: float) -> pd.DataFrame:
+        """Forward rate from start to start+length years (e.g. 5y5y), date × country."""
+        y1, y2 = ns_yield(self.params, start), ns_yield(self.params, start + length)
+        fwd = (y2 * (start + length) - y1 * start) / length
+        return pd.DataFrame(fwd, index=self.dates, columns=self.countries)
+
+
+def fit_cube(cube: YieldCube, prev: CurveFit | None = None) -> CurveFit:
+    """
+    Fit every country × date of the cube in one batch.
+    Given the previous fit of the same history, only the days from its last
+    date onwards are refitted, warm-started from that day's decay parameters.
+    """
+    tau = np.array([TENOR_YEARS[t] for t in cube.tenors])
+    n_dates, n_countries, n_tenors = cube.values.shape
+    params = np.full((n_dates, n_countries, 4), np.nan)
+    start, lam0 = 0, None
+    if (prev is not None and prev.countries == cube.countries and len(prev.dates)
+            and len(prev.dates) <= n_dates and cube.dates[:len(prev.dates)].equals(prev.dates)):
+        start = len(prev.dates) - 1                     # the last day may have been partial
+        params[:start] = prev.params[:start]
+        last_lam = pd.DataFrame(prev.params[:, :, 3]).ffill().to_numpy()[-1]
+        lam0 = np.tile(last_lam, n_dates - start)
+    if n_dates > start:
+        fresh = fit_nelson_siegel(tau, cube.values[start:].reshape(-1, n_tenors), lam0)
+        params[start:] = fresh.reshape(n_dates - start, n_countries, 4)
+    return CurveFit(cube.dates, cube.countries, params)
+
+
+# ─────────────────────────────────────────────────────────────
+# SPREAD MATH
+# ─────────────────────────────────────────────────────────────
+
+def compute_curve_spread(yields: dict, country: str, t1: str, t2: str) -> float | None:
+    """Yield curve spread t2 - t1 in bps."""
+    c = yields.get(country, {})
+    if t1 in c and t2 in c:
+        return (c[t2] - c[t1]) * 100
+    return None
+
+
+def compute_box(yields: dict, c1: str, c2: str, t1: str, t2: str) -> float | None:
+    """Box spread = (c1 curve slope) - (c2 curve slope), in bps."""
+    s1 = compute_curve_spread(yields, c1, t1, t2)
+    s2 = compute_curve_spread(yields, c2, t1, t2)
+    if s1 is not None and s2 is not None:
+        return s1 - s2
+    return None
+
+
+def compute_country_spread(yields: dict, c1: str, c2: str, tenor: str) -> float | None:
+    """Sovereign spread c1 - c2 at one tenor, in bps."""
+    v1, v2 = yields.get(c1, {}).get(tenor), yields.get(c2, {}).get(tenor)
+    if v1 is not None and v2 is not None:
+        return (v1 - v2) * 100
+    return None
+
+
+def crypto_quotes(cg_data: dict, crypto_yf: dict) -> dict:
+    """
+    {name: {"price", "pct", "chg", "prev"}} for every CRYPTO_YF coin from CoinGecko,
+    falling back to the Yahoo snapshot (snapshot_slice of CRYPTO_YF) on a miss
+    or for a coin without a CoinGecko id.
+    """
+    quotes = {}
+    for name in CRYPTO_YF:
+        d = cg_data.get(COINGECKO_IDS[name][0], {}) if name in COINGECKO_IDS else {}
+        price = d.get("usd")
+        pct24h = d.get("usd_24h_change") or 0   # CoinGecko sends null for a coin without a 24h change
+        if price is None and crypto_yf.get(name, {}).get("ok"):
+            price, pct24h = crypto_yf[name]["price"], crypto_yf[name]["pct"]
+        # CoinGecko gives the 24h % only; the reference price is implied by it
+        prev = price / (1 + pct24h / 100) if price and pct24h > -100 else None
+        quotes[name] = {"price": price, "pct": pct24h, "prev": prev,
+                        "chg": price - prev if prev else 0}
+    return quotes
+
+
+# ─────────────────────────────────────────────────────────────
+# CROSS-ASSET RISK (rolling vol, beta, correlation)
+# ─────────────────────────────────────────────────────────────
+
+CROSS_ASSETS = {label: sym for group in flagged_groups("risk") for label, sym in group_tickers(group).items()}
+ROLLING_WINDOW = 60       # daily returns per window
+PERIODS_PER_YEAR = 252
+BETA_BENCHMARK = "S&P 500"
+
+
+def align_closes(histories: dict, universe: dict) -> pd.DataFrame:
+    """
+    Daily closes of a {label: ticker} universe on one weekday calendar:
+    the union of every ticker's dates, weekends dropped (crypto weekend
+    moves land on Monday), gaps carried forward. Columns are labels.
+    """
+    closes = pd.DataFrame({label: histories[t]["Close"] for label, t in universe.items()
+                           if t in histories and not histories[t].empty})
+    closes = closes[closes.index.dayofweek < 5].ffill()
+    return closes.reindex(columns=[label for label in universe if label in closes])
+
+
+class RollingCrossAsset:
+    """
+    Rolling realized vol, beta and correlation of daily log returns over the
+    last `window` bars, kept as running sums (Σr and Σrrᵀ) over a ring of
+    return rows. A new bar adds its row and evicts the oldest; a revised
+    bar (same date, e.g. today's still forming) swaps its row out. Either
+    is O(n²) — no pass over the history.
+    Missing prices count as unchanged (zero return).
+    """
+
+    _SIGNS = np.array([1.0, -1.0])
+
+    def __init__(self, window: int = ROLLING_WINDOW):
+        self.window = window
+        self.labels = []
+        self.last_date = None
+        self._lock = threading.Lock()
+
+    def seed(self, closes: pd.DataFrame):
+        """Start over from aligned closes (align_closes), in one vectorized pass."""
+        prices = closes.to_numpy(dtype=float)
+        returns = np.nan_to_num(np.diff(np.log(prices), axis=0)[-self.window:])
+        with self._lock:
+            self.labels = list(closes.columns)
+            self._ring = np.zeros((self.window, len(self.labels)))
+            self._ring[:len(returns)] = returns
+            self._count, self._head = len(returns), len(returns) % self.window
+            self._sum = returns.sum(axis=0)
+            self._cross = returns.T @ returns
+            self._prev, self._last = prices[-2] if len(prices) > 1 else prices[-1], prices[-1]
+            self.last_date = closes.index[-1]
+
+    def update(self, when: pd.Timestamp, prices: np.ndarray):
+        """Fold in one bar of closes (in label order): a new date, or a revision of the last one."""
+        with self._lock:
+            if when < self.last_date:
+                return
+            prices = np.where(np.isnan(prices), self._last, prices)
+            if when == self.last_date:
+                # Same bar, new prices: swap its return row for the revised one
+                row = (self._head - 1) % self.window
+                old, new = self._ring[row].copy(), np.nan_to_num(np.log(prices / self._prev))
+                self._last = prices
+            else:
+                row = self._head
+                old = self._ring[row].copy() if self._count == self.window else np.zeros(len(self.labels))
+                new = np.nan_to_num(np.log(prices / self._last))
+                self._prev, self._last = self._last, prices
+                self._head = (self._head + 1) % self.window
+                self._count = min(self._count + 1, self.window)
+                self.last_date = when
+            self._ring[row] = new
+            self._sum += new - old
+            # Rank-2 update in one matrix product: + new·newᵀ - old·oldᵀ
+            pair = np.stack((new, old))
+            self._cross += (pair.T * self._SIGNS) @ pair
+
+    def sync(self, closes: pd.DataFrame):
+        """
+        Catch up with aligned closes: only bars from the last one held on are
+        applied. Seeds on the first call, or when the universe changed.
+        """
+        if self.last_date is None or list(closes.columns) != self.labels:
+            self.seed(closes)
+            return
+        tail = closes[closes.index >= self.last_date]
+        for when, prices in zip(tail.index, tail.to_numpy(dtype=float)):
+            self.update(when, prices)
+
+    def _comoments(self) -> tuple:
+        """(n, Σ(r - r̄)(r - r̄)ᵀ) of the window, as a fresh array."""
+        with self._lock:
+            n = self._count
+            return n, self._cross - self._sum[:, None] * (self._sum / n)
+
+    def cov(self) -> np.ndarray:
+        """Sample covariance of the window's returns."""
+        n, m = self._comoments()
+        m /= max(n - 1, 1)
+        return m
+
+    def corr(self) -> np.ndarray:
+        """Correlation matrix of the window's returns (label order)."""
+        _, m = self._comoments()
+        return self._normalize(m)
+
+    @staticmethod
+    def _normalize(m: np.ndarray) -> np.ndarray:
+        """Comoments → correlations, in place (flat series give NaN)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            inv = 1 / np.sqrt(m.diagonal())
+        m *= inv[:, None]
+        m *= inv
+        return m
+
+    def stats(self, benchmark: str = BETA_BENCHMARK) -> dict:
+        """{"vol" (annualized %), "beta" (vs benchmark), "corr", "as_of", "window"} of the current window."""
+        n, m = self._comoments()
+        vol = np.sqrt(np.clip(m.diagonal(), 0, None) / max(n - 1, 1) * PERIODS_PER_YEAR) * 100
+        b = self.labels.index(benchmark) if benchmark in self.labels else None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            beta = m[:, b] / m[b, b] if b is not None else np.full(len(vol), np.nan)
+        corr = self._normalize(m)
+        return {
+            "vol": pd.Series(vol, index=self.labels),
+            "beta": pd.Series(beta, index=self.labels),
+            "corr": pd.DataFrame(corr, index=self.labels, columns=self.labels),
+            "as_of": self.last_date,
+            "window": n,
+        }
+
+
+# ─────────────────────────────────────────────────────────────
+# LIVE QUOTES (push stream)
+# ─────────────────────────────────────────────────────────────
+
+# wss:// (Yahoo's streamer protocol), http(s):// server-sent events of JSON ticks, or none
+STREAM_URL = os.environ.get("MACRO_STREAM_URL", "wss://streamer.finance.yahoo.com/?version=2")
+STREAM_SYMBOLS = tuple(dict.fromkeys(
+    i["symbol"] for group in flagged_groups("stream") for i in group_instruments(group)
+))
+RING_SIZE = 4096          # ticks kept per symbol
+STREAM_BAR_SECONDS = 60   # trailing bar shown on the live tiles
+STREAM_IDLE = 60          # seconds without a tick before the feed no longer counts as live
+STREAM_RESUBSCRIBE = 15   # Yahoo drops subscriptions that are not renewed
+STREAM_MAX_BACKOFF = 60   # cap on the reconnect delay, seconds
+
+OHLC_COLUMNS = ["open", "high", "low", "close", "volume", "ticks"]
+
+
+class TickRing:
+    """
+    Fixed-size ring of (time, price, size) ticks for one symbol. An append
+    overwrites the oldest tick once full; reads return chronological copies.
+    """
+
+    def __init__(self, size: int = RING_SIZE):
+        self._t = np.zeros(size)
+        self._p = np.zeros(size)
+        self._v = np.zeros(size)
+        self._n = 0           # ticks ever appended
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._n, len(self._t))
+
+    def append(self, t: float, price: float, size: float = 0.0):
+        with self._lock:
+            i = self._n % len(self._t)
+            self._t[i], self._p[i], self._v[i] = t, price, size
+            self._n += 1
+
+    def last(self) -> tuple | None:
+        """(time, price) of the newest tick."""
+        with self._lock:
+            if not self._n:
+                return None
+            i = (self._n - 1) % len(self._t)
+            return float(self._t[i]), float(self._p[i])
+
+    def view(self, since: float = 0.0) -> tuple:
+        """(t, price, size) arrays of the buffered ticks at or after `since`, oldest first."""
+        with self._lock:
+            n, size = self._n, len(self._t)
+            order = np.arange(n - min(n, size), n) % size
+            t, p, v = self._t[order], self._p[order], self._v[order]
+        keep = t >= since
+        return t[keep], p[keep], v[keep]
+
+    def ohlc(self, bar_seconds: int = STREAM_BAR_SECONDS) -> pd.DataFrame:
+        """Clock-aligned OHLC bars of the buffered ticks (open/high/low/close/volume/ticks)."""
+        t, p, v = self.view()
+        if not len(t):
+            return pd.DataFrame(columns=OHLC_COLUMNS)
+        # Feeds can deliver a tick late; bar by exchange time, not arrival order
+        order = np.argsort(t, kind="stable")
+        t, p, v = t[order], p[order], v[order]
+        bucket = (t // bar_seconds).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], len(t)]
+        return pd.DataFrame({
+            "open": p[starts], "high": np.maximum.reduceat(p, starts),
+            "low": np.minimum.reduceat(p, starts), "close": p[ends - 1],
+            "volume": np.add.reduceat(v, starts), "ticks": ends - starts,
+        }, index=pd.to_datetime(bucket[starts] * bar_seconds, unit="s"))
+
+
+def parse_tick(raw: str | bytes) -> tuple | None:
+    """
+    (symbol, time s, price, size) from one stream message: Yahoo's base64
+    protobuf frame ({"message": ...}) or a plain JSON tick
+    ({"symbol" | "id", "price", "time" ms, "size"}). None for anything else.
+    """
+    try:
+        msg = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(msg, dict):
+        return None
+    if "message" in msg:
+        # yfinance (>= 0.2.55, with protobuf) ships the schema; only Yahoo's own feed needs it.
+        # An ImportError ends the stream (QuoteStream._run) rather than dropping every tick
+        from yfinance.pricing_pb2 import PricingData
+        data = PricingData()
+        try:
+            data.ParseFromString(base64.b64decode(msg["message"]))
+        except Exception:
+            return None
+        symbol, price, ms, size = data.id, data.price, data.time, data.last_size
+    else:
+        symbol, price = msg.get("symbol") or msg.get("id"), msg.get("price")
+        ms, size = msg.get("time"), msg.get("size")
+    if not symbol or not price:
+        return None
+    return symbol, (float(ms) / 1000 if ms else time.time()), float(price), float(size or 0)
+
+
+class QuoteStream:
+    """
+    Push feed of live prices into one TickRing per symbol, read on a daemon
+    thread that reconnects with capped exponential backoff. wss:// speaks
+    Yahoo's streamer protocol (subscribe message, renewed every
+    STREAM_RESUBSCRIBE s); http(s):// reads server-sent events of JSON ticks.
+    """
+
+    def __init__(self, url: str = STREAM_URL, symbols=STREAM_SYMBOLS, ring_size: int = RING_SIZE):
+        self.url = url
+        self.symbols = list(symbols)
+        self.rings = {s: TickRing(ring_size) for s in self.symbols}
+        self.state = "connecting"
+        self.ticks = 0
+        self.last_tick = 0.0
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="quote-stream", daemon=True)
+        self._thread.start()
+
+    @property
+    def live(self) -> bool:
+        return self.state == "live" and time.time() - self.last_tick < STREAM_IDLE
+
+    def status(self) -> dict:
+        return {"url": self.url, "state": self.state, "live": self.live, "ticks": self.ticks,
+                "last_tick": self.last_tick or None, "error": self.error}
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def _on_message(self, raw):
+        tick = parse_tick(raw)
+        if tick is None or tick[0] not in self.rings:
+            return
+        symbol, t, price, size = tick
+        self.rings[symbol].append(t, price, size)
+        self.ticks += 1
+        self.last_tick = time.time()
+        self.state = "live"
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            connected = time.time()
+            try:
+                if urlsplit(self.url).scheme in ("ws", "wss"):
+                    self._listen_ws()
+                else:
+                    self._listen_sse()
+                self.error = None
+            except ImportError as e:
+                # No decoder or client for this feed (websockets, yfinance's protobuf schema):
+                # retrying can't help, so the tiles stay on the polled snapshot
+                self.error = f"{type(e).__name__}: {e}"
+                self.state = "unavailable"
+                return
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+            if self._stop.is_set():
+                break
+            self.state = "reconnecting"
+            # A connection that held up for a while starts the backoff over
+            if time.time() - connected > STREAM_IDLE:
+                backoff = 1.0
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, STREAM_MAX_BACKOFF)
+        self.state = "stopped"
+
+    def _listen_ws(self):
+        from websockets.sync.client import connect   # only the wss:// feed needs websockets
+        with connect(self.url, open_timeout=HTTP_TIMEOUT) as ws:
+            self.state = "connected"
+            subscribed = 0.0
+            while not self._stop.is_set():
+                if time.time() - subscribed > STREAM_RESUBSCRIBE:
+                    ws.send(json.dumps({"subscribe": self.symbols}))
+                    subscribed = time.time()
+                try:
+                    raw = ws.recv(timeout=1)
+                except TimeoutError:
+                    continue
+                self._on_message(raw)
+
+    def _listen_sse(self):
+        with http_session().get(self.url, stream=True, timeout=(HTTP_TIMEOUT, STREAM_IDLE),
+                                headers={"Accept": "text/event-stream"}) as r:
+            r.raise_for_status()
+            self.state = "connected"
+            # iter_lines waits for a full chunk; urllib3 2's read1 hands over whatever has arrived
+            if hasattr(r.raw, "read1"):
+                chunks = iter(lambda: r.raw.read1(65536, decode_content=True), b"")
+            else:
+                chunks = r.iter_content(chunk_size=1)
+            pending = b""
+            for chunk in chunks:
+                if self._stop.is_set():
+                    return
+                *lines, pending = (pending + chunk).split(b"\n")
+                for line in lines:
+                    if line.startswith(b"data:"):
+                        self._on_message(line[5:].strip())
+
+
+def stream_quote(quote: dict, ring: TickRing | None, window: int = STREAM_BAR_SECONDS) -> dict:
+    """
+    The snapshot quote moved to the newest streamed tick. Change and % stay
+    measured against the snapshot's reference ("prev", else price - chg); "bar" is the
+    OHLC of the trailing `window` seconds of ticks. Unchanged without ticks.
+    """
+    last = ring.last() if ring is not None else None
+    if last is None or not quote.get("price"):
+        return quote
+    t, price = last
+    ref = quote.get("prev") or quote["price"] - quote.get("chg", 0)
+    _, p, _ = ring.view(since=t - window)
+    live = dict(quote, price=price, chg=price - ref,
+                pct=(price / ref - 1) * 100 if ref else quote.get("pct", 0), at=t,
+                bar={"open": p[0], "high": p.max(), "low": p.min(), "close": p[-1], "ticks": len(p)})
+    if quote.get("open"):
+        live["open_pct"] = (price / quote["open"] - 1) * 100
+    return live
+
+
+# ─────────────────────────────────────────────────────────────
+# FETCH ORCHESTRATION
+# ─────────────────────────────────────────────────────────────
+
+# Per-source deadline (seconds from the start of the fetch round)
+SOURCE_DEADLINES = {
+    "yahoo":       20,
+    "history":     25,
+    "intraday":    20,
+    "cross_asset": 30,
+    "ecb":         25,
+    "fred":        15,
+    "coingecko":   10,
+    "etf":         25,
+}
+
+# Upstream (breaker) behind each source; a source is "degraded" while it is unhealthy
+SOURCE_UPSTREAMS = {
+    "yahoo":       "yahoo",
+    "history":     "yahoo",
+    "intraday":    "yahoo",
+    "cross_asset": "yahoo",
+    "etf":         "yahoo",
+    "ecb":         urlsplit(ECB_BASE_URL).hostname,
+    "fred":        "fred.stlouisfed.org",
+    "coingecko":   "api.coingecko.com",
+}
+
+# Value handed to a section when its source errors or misses its deadline
+SOURCE_DEFAULTS = {
+    "yahoo": pd.DataFrame(columns=["price", "prev", "chg", "pct", "ok"]),
+    "history": {},
+    "intraday": {"snapshot": pd.DataFrame(columns=["price", "prev", "chg", "pct", "ok"]), "bars": {}},
+    "cross_asset": {},
+    "ecb": {c: {} for c in ECB_COUNTRIES}, "fred": {}, "coingecko": {},
+    "etf": {"etfs": {}, "daily": pd.Series(dtype=float), "cumulative": pd.Series(dtype=float),
+            "dollar_volume": pd.Series(dtype=float)},
+}
+
+
+def run_sources(jobs: dict, deadlines: dict, defaults: dict):
+    """
+    Run every {name: callable} in a thread pool and yield
+    (name, result, status) in completion order.
+    A source still running at its deadline is yielded with its default and
+    state "timeout"; the worker is left to finish and warm the cache. One
+    that returned while its upstream's breaker is open or failing is
+    "degraded": its fetcher fell back to stored or empty data.
+    """
+    pool = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="fetch")
+    start = time.monotonic()
+    pending = {pool.submit(fn): name for name, fn in jobs.items()}
+    try:
+        while pending:
+            elapsed = time.monotonic() - start
+            for fut in [f for f, name in pending.items() if elapsed >= deadlines.get(name, 30)]:
+                name = pending.pop(fut)
+                yield name, defaults.get(name), {"state": "timeout", "elapsed": elapsed}
+            if not pending:
+                break
+            next_deadline = min(deadlines.get(name, 30) for name in pending.values())
+            done, _ = wait(pending, timeout=max(next_deadline - elapsed, 0),
+                           return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = pending.pop(fut)
+                status = {"state": "ok", "elapsed": time.monotonic() - start}
+                try:
+                    result = fut.result()
+                    guard = breaker(SOURCE_UPSTREAMS[name]) if name in SOURCE_UPSTREAMS else None
+                    if guard is not None and guard.degraded:
+                        # "failing" until the breaker opens on repeated failures
+                        status.update(state="degraded",
+                                      breaker="failing" if guard.state == "closed" else guard.state)
+                except Exception as e:
+                    result = defaults.get(name)
+                    status.update(state="error", error=str(e))
+                yield name, result, status
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ─────────────────────────────────────────────────────────────
+# SNAPSHOT
+# ─────────────────────────────────────────────────────────────
+
+SNAPSHOT_JOBS = {
+    "yahoo":     lambda fred_key: fetch_yf_universe(SNAPSHOT_SYMBOLS),
+    "ecb":       lambda fred_key: fetch_ecb_yields(),
+    "fred":      lambda fred_key: fetch_fred_yields(fred_key),
+    "coingecko": lambda fred_key: fetch_coingecko(),
+    "etf":       lambda fred_key: fetch_etf_flows(BTC_ETFS),
+}
+
+
+def assemble_snapshot(data: dict) -> dict:
+    """
+    Market snapshot from one round of source results (as run_sources yields):
+    tiles, yields, sovereign/curve spreads, boxes and ETF flows, in bps where
+    it's a spread.
+    """
+    tiles = {name: snapshot_slice(data["yahoo"], group_tickers(name)) for name in flagged_groups("snapshot")}
+    tiles["crypto"] = crypto_quotes(data["coingecko"], snapshot_slice(data["yahoo"], CRYPTO_YF))
+    yields = {**data["ecb"], "US": data["fred"]}
+    return {
+        "as_of": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "tiles": tiles,
+        "yields": yields,
+        "spreads": {
+            "sovereign": {label: {t: compute_country_spread(yields, c1, c2, t) for t in TENORS}
+                          for label, c1, c2 in SOVEREIGN_SPREADS},
+            "curve": {c: {label: compute_curve_spread(yields, c, t1, t2) for label, t1, t2 in SPREADS_DEF}
+                      for c in CUBE_COUNTRIES},
+        },
+        "boxes": {label: {sp: compute_box(yields, c1, c2, t1, t2) for sp, t1, t2 in SPREADS_DEF}
+                  for label, c1, c2 in BOX_PAIRS},
+        "etf_flows": {
+            "etfs": data["etf"]["etfs"],
+            "daily": _last_value(data["etf"]["daily"]),
+            "cumulative": _last_value(data["etf"]["cumulative"]),
+        },
+    }
+
+
+def _last_value(series: pd.Series) -> float | None:
+    series = series.dropna()
+    return float(series.iloc[-1]) if len(series) else None
+
+
+def build_snapshot(fred_key: str = "", bars: str = "1d") -> dict:
+    """
+    Fetch every snapshot source concurrently (per-source deadlines) and assemble.
+    bars="1m" prices the tiles off intraday bars: change vs prior close and vs session open.
+    """
+    data, status = {}, {}
+    jobs = {name: functools.partial(job, fred_key) for name, job in SNAPSHOT_JOBS.items()}
+    if bars != "1d":
+        jobs["yahoo"] = lambda: intraday_snapshot(fetch_yf_intraday(SNAPSHOT_SYMBOLS, bars), SNAPSHOT_SYMBOLS)
+    for name, result, st in run_sources(jobs, SOURCE_DEADLINES, SOURCE_DEFAULTS):
+        data[name], status[name] = result, st
+    snapshot = assemble_snapshot(data)
+    snapshot["sources"] = status
+    return snapshot
+
+
+def flatten_snapshot(snapshot: dict) -> pd.DataFrame:
+    """Long (path, value, text) table of a snapshot: numbers in value, anything else in text."""
+    rows = []
+
+    def walk(node, path):
+        if isinstance(node, dict):
+            for k, v in node.items():
+                walk(v, path + (str(k),))
+        elif isinstance(node, (int, float, np.number)) and not isinstance(node, bool):
+            rows.append((".".join(path), float(node), None))
+        else:
+            rows.append((".".join(path), np.nan, None if node is None else str(node)))
+
+    walk(snapshot, ())
+    return pd.DataFrame(rows, columns=["path", "value", "text"])
+
+
+def write_snapshot(snapshot: dict, out: str, fmt: str | None = None):
+    """Write to out ('-' for stdout) as json or parquet (default: from the extension)."""
+    fmt = fmt or ("parquet" if str(out).endswith(".parquet") else "json")
+    if fmt == "parquet":
+        if out == "-":
+            raise ValueError("parquet output needs a file path")
+        flatten_snapshot(snapshot).to_parquet(out, index=False)
+        return
+    text = json.dumps(snapshot, indent=2, default=str)
+    if out == "-":
+        sys.stdout.write(text + "\n")
+    else:
+        Path(out).write_text(text)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="macro_core", description="Headless macro dashboard data.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    snap = sub.add_parser("snapshot", help="write a full market snapshot")
+    snap.add_argument("-o", "--out", default="-", help="output path, '-' for stdout (default)")
+    snap.add_argument("--format", choices=["json", "parquet"], help="default: from the extension")
+    snap.add_argument("--fred-key", default=os.environ.get("FRED_API_KEY", ""))
+    snap.add_argument("--bars", choices=["1d", *INTRADAY_RETENTION], default="1d",
+                      help="tile prices from daily (default) or intraday bars")
+    snap.add_argument("--allow-degraded", action="store_true",
+                      help="exit 0 even when a source is not ok (the snapshot is written either way)")
+    args = ap.parse_args(argv)
+
+    snapshot = build_snapshot(args.fred_key, args.bars)
+    write_snapshot(snapshot, args.out, args.format)
+    failed = [name for name, st in snapshot["sources"].items() if st["state"] != "ok"]
+    if failed:
+        print(f"degraded sources: {', '.join(failed)}", file=sys.stderr)
+    return 1 if failed and not args.allow_degraded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
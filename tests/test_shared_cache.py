@@ -0,0 +1,175 @@
+"""
+Shared cache backends against local stand-ins: RedisCache over a minimal
+RESP server on a socket (GET, SET PX/NX, DEL, SELECT), SQLiteCache on a
+temp file, and the data-only value codec.
+
+Run:
+    python -m pytest -q tests
+"""
+
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import macro_core as core  # noqa: E402
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of the Redis protocol for RedisCache, with a switch to drop every client."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        self.data, self.expiry, self.lock, self.clients = {}, {}, threading.Lock(), []
+        self.commands = []
+        super().__init__(("127.0.0.1", 0), RespHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def drop_clients(self):
+        for conn in list(self.clients):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self.clients.clear()
+
+    def execute(self, cmd: list):
+        name = cmd[0].decode().upper()
+        self.commands.append(name)
+        now = time.time()
+        with self.lock:
+            for key in [k for k, t in self.expiry.items() if t <= now]:
+                self.data.pop(key, None)
+                self.expiry.pop(key, None)
+            if name == "SELECT":
+                return b"+OK\r\n"
+            if name == "GET":
+                value = self.data.get(cmd[1])
+                return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+            if name == "SET":
+                key, value, opts = cmd[1], cmd[2], [o.decode().upper() for o in cmd[3:]]
+                if "NX" in opts and key in self.data:
+                    return b"$-1\r\n"
+                self.data[key] = value
+                self.expiry.pop(key, None)
+                if "PX" in opts:
+                    self.expiry[key] = now + int(opts[opts.index("PX") + 1]) / 1000
+                return b"+OK\r\n"
+            if name == "DEL":
+                return b":%d\r\n" % sum(self.data.pop(k, None) is not None for k in cmd[1:])
+        return b"-ERR unknown command\r\n"
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.clients.append(self.connection)
+        while True:
+            try:
+                line = self.rfile.readline()
+            except OSError:
+                return
+            if not line.startswith(b"*"):
+                return
+            cmd = []
+            for _ in range(int(line[1:])):
+                n = int(self.rfile.readline()[1:])
+                cmd.append(self.rfile.read(n + 2)[:-2])
+            self.wfile.write(self.server.execute(cmd))
+
+
+@pytest.fixture
+def server():
+    srv = RespStandIn()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def redis(server) -> core.RedisCache:
+    return core.RedisCache("127.0.0.1", server.port, db=1)
+
+
+def test_get_set_px_nx_del(server):
+    cache = redis(server)
+    assert cache.get("k") is core._MISSING
+    cache.set("k", {"a": 1.5}, time.time() + 0.3)
+    assert cache.get("k") == {"a": 1.5}
+    time.sleep(0.4)
+    assert cache.get("k") is core._MISSING            # PX expired it
+
+    assert cache.claim("k", 5) is True
+    assert redis(server).claim("k", 5) is False        # NX: one holder at a time
+    cache.release("k")
+    assert redis(server).claim("k", 5) is True         # DEL freed it
+    assert server.commands[0] == "SELECT"
+
+
+def test_reconnects_after_dropped_socket(server):
+    cache = redis(server)
+    cache.set("k", [1, 2], time.time() + 30)
+    server.drop_clients()
+    try:
+        value = cache.get("k")
+    except OSError:
+        value = cache.get("k")   # the failed command closed the socket; this one reconnects
+    assert value == [1, 2]
+
+
+@pytest.mark.parametrize("backend", ["redis", "sqlite"])
+def test_one_fill_per_window(server, tmp_path, backend):
+    fills, lock = [], threading.Lock()
+
+    def fill():
+        with lock:
+            fills.append(1)
+        time.sleep(0.2)
+        return {"price": 101.5}
+
+    def replica():
+        # A connection per caller, as separate replicas would have
+        cache = redis(server) if backend == "redis" else core.SQLiteCache(tmp_path / "cache.sqlite")
+        return cache.fetch_through("v:yahoo:1:abc", time.time() + 30, fill)
+
+    threads, results = [], []
+    for _ in range(8):
+        t = threading.Thread(target=lambda: results.append(replica()))
+        threads.append(t)
+        t.start()
+    for t in threads:
+        t.join(10)
+    assert len(fills) == 1
+    assert len(results) == 8
+    assert all(value == {"price": 101.5} for value, _ in results)
+    assert sorted(hit for _, hit in results) == [False] + [True] * 7
+
+
+def test_codec_round_trip_is_data_only():
+    idx = pd.date_range("2024-01-01", periods=3, freq="D", tz="UTC", name="date")
+    value = (time.time(), {
+        "frame": pd.DataFrame({"Close": [1.0, 2.0, np.nan], "ok": [True, False, True]}, index=idx),
+        "series": pd.Series([0.1, 0.2], index=["S&P 500", "DAX"], name="vol"),
+        "as_of": pd.Timestamp("2024-01-03"),
+        ("DE", "10Y"): [2.1, None, "x"],
+    })
+    back = core.load_value(core.dump_value(value))
+    assert back[0] == value[0]
+    pd.testing.assert_frame_equal(back[1]["frame"], value[1]["frame"], check_freq=False)
+    pd.testing.assert_series_equal(back[1]["series"], value[1]["series"], check_index_type=False)
+    assert back[1]["as_of"] == value[1]["as_of"]
+    assert back[1][("DE", "10Y")] == [2.1, None, "x"]
+    with pytest.raises(TypeError):
+        core.dump_value({"fn": print})